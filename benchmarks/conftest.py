@@ -0,0 +1,56 @@
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+
+# Небольшой набор seed_data: хватает, чтобы в лентах были полные
+# страницы, и собирается за секунды.
+SEED = {'users': 2000, 'groups': 50, 'posts': 20000, 'comments': 10000,
+        'follows': 10}
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmark')
+    group.addoption('--benchmark-json', metavar='PATH',
+                    help='Сохранить результаты замеров в JSON.')
+    group.addoption('--benchmark-compare', metavar='PATH',
+                    help='JSON прошлого прогона: регрессия роняет тест.')
+    group.addoption('--benchmark-threshold', type=float, default=0.2,
+                    help='Допустимый рост p95, доля.')
+    group.addoption('--benchmark-runs', type=int, default=30)
+
+
+def pytest_collection_modifyitems(config, items):
+    # Замеры долгие: только по явному -m benchmark.
+    if 'benchmark' in (config.getoption('markexpr') or ''):
+        return
+    skip = pytest.mark.skip(reason='замеры запускаются с -m benchmark')
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        call_command('seed_data', stdout=io.StringIO(), **SEED)
+
+
+@pytest.fixture(scope='session')
+def benchmark_report(request):
+    report = {'views': {}}
+    yield report
+    path = request.config.getoption('--benchmark-json')
+    if path and report['views']:
+        with open(path, 'w', encoding='utf-8') as stream:
+            json.dump(report, stream, ensure_ascii=False, indent=2)
+
+
+@pytest.fixture(scope='session')
+def baseline(request):
+    path = request.config.getoption('--benchmark-compare')
+    if not path:
+        return None
+    with open(path, encoding='utf-8') as stream:
+        return json.load(stream)
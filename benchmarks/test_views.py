@@ -0,0 +1,23 @@
+import pytest
+
+from posts import benchmarks
+
+VIEWS = ('index', 'group_posts', 'profile', 'post_detail', 'post_comments',
+         'follow_index', 'post_create', 'add_comment')
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', VIEWS)
+def test_view(name, request, benchmark_report, baseline):
+    runs = request.config.getoption('--benchmark-runs')
+    report = benchmarks.run(runs=runs, warmup=3, names=[name])
+    result = report['views'][name]
+    benchmark_report.update(
+        {key: value for key, value in report.items() if key != 'views'})
+    benchmark_report['views'][name] = result
+    assert result['status'] in (200, 302), result
+    if baseline is not None:
+        threshold = request.config.getoption('--benchmark-threshold')
+        found = benchmarks.regressions(baseline, report, threshold)
+        assert not found, found
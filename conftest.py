@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.fixture(scope='session', autouse=True)
+def isolated_settings():
+    """Кэш во временном каталоге, как у manage.py test."""
+    from core.runner import isolated_settings
+    with isolated_settings():
+        yield
@@ -0,0 +1,265 @@
+"""Кэш в файле SQLite (режим WAL), общий для всех процессов на хосте.
+
+В отличие от LocMemCache, запись и инвалидация в одном воркере сразу
+видны остальным, и для этого не нужен Redis или memcached. Целые числа
+хранятся как INTEGER, поэтому incr атомарен внутри SQLite. Размер
+ограничен MAX_ENTRIES: при переполнении удаляются просроченные и давно
+не читанные записи (приблизительный LRU).
+"""
+import os
+import pickle
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.test.utils import override_settings
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY, value BLOB, expires REAL, accessed REAL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+ALIVE = '(expires IS NULL OR expires > ?)'
+# SQLite ограничивает число параметров запроса (999 в старых сборках).
+CHUNK = 500
+
+
+def _chunks(items, size=CHUNK):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SQLiteCache(BaseCache):
+    """Бэкенд кэша поверх SQLite. LOCATION - путь к файлу базы.
+
+    Кроме стандартных MAX_ENTRIES и CULL_FREQUENCY понимает OPTIONS:
+    ACCESS_RESOLUTION - не чаще скольких секунд чтение обновляет отметку
+    доступа для LRU (чтобы не писать на каждый get), CULL_PROBABILITY -
+    доля записей, после которых проверяется переполнение, BUSY_TIMEOUT -
+    сколько секунд ждать чужую блокировку записи.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._access_resolution = float(
+            options.get('ACCESS_RESOLUTION', 60))
+        self._cull_probability = float(options.get('CULL_PROBABILITY', 0.01))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        # Соединение своё у каждого потока и у каждого процесса после fork.
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self._path, timeout=self._busy_timeout,
+                                 isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                db.execute(statement)
+            local.db, local.pid = db, os.getpid()
+        return local.db
+
+    def _write(self, func):
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            result = func(db)
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return result
+
+    @staticmethod
+    def _encode(value):
+        if type(value) is int:
+            return value
+        return sqlite3.Binary(
+            pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _touch_read(self, db, found, now):
+        stale = [key for key, accessed in found
+                 if accessed < now - self._access_resolution]
+        if stale:
+            for chunk in _chunks(stale):
+                db.execute(
+                    'UPDATE cache SET accessed = ? WHERE key IN (%s)'
+                    % ','.join('?' * len(chunk)), [now, *chunk])
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        row = self._db.execute(
+            f'SELECT value, accessed FROM cache WHERE key = ? AND {ALIVE}',
+            (key, now)).fetchone()
+        if row is None:
+            return default
+        self._touch_read(self._db, [(key, row[1])], now)
+        return self._decode(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        now = time.time()
+        result, found = {}, []
+        for chunk in _chunks(list(keys)):
+            rows = self._db.execute(
+                'SELECT key, value, accessed FROM cache '
+                f'WHERE key IN ({",".join("?" * len(chunk))}) AND {ALIVE}',
+                [*chunk, now])
+            for key, value, accessed in rows:
+                result[keys[key]] = self._decode(value)
+                found.append((key, accessed))
+        self._touch_read(self._db, found, now)
+        return result
+
+    def _rows(self, data, timeout, version):
+        now = time.time()
+        expires = self.get_backend_timeout(timeout)
+        return [(self._key(key, version), self._encode(value),
+                 expires, now) for key, value in data.items()]
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        rows = self._rows(data, timeout, version)
+        self._write(lambda db: db.executemany(
+            'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?)', rows))
+        self._maybe_cull()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        (row,) = self._rows({key: value}, timeout, version)
+
+        def add(db):
+            db.execute(f'DELETE FROM cache WHERE key = ? AND NOT {ALIVE}',
+                       (row[0], row[3]))
+            return db.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)', row).rowcount == 1
+
+        added = self._write(add)
+        if added:
+            self._maybe_cull()
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        return self._write(lambda db: db.execute(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {ALIVE}',
+            (self.get_backend_timeout(timeout), key, now)).rowcount == 1)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+
+        def incr(db):
+            row = db.execute(
+                f'SELECT value FROM cache WHERE key = ? AND {ALIVE}',
+                (key, now)).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            if not isinstance(row[0], int):
+                raise ValueError("Key '%s' is not an integer" % key)
+            db.execute('UPDATE cache SET value = value + ? WHERE key = ?',
+                       (delta, key))
+            return row[0] + delta
+
+        return self._write(incr)
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        return self._db.execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {ALIVE}',
+            (key, time.time())).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+
+        def delete(db):
+            for chunk in _chunks(keys):
+                db.execute('DELETE FROM cache WHERE key IN (%s)'
+                           % ','.join('?' * len(chunk)), chunk)
+
+        self._write(delete)
+
+    def clear(self):
+        self._write(lambda db: db.execute('DELETE FROM cache'))
+
+    def _maybe_cull(self):
+        if random.random() < self._cull_probability:
+            self._cull()
+
+    def _cull(self):
+        def cull(db):
+            db.execute(f'DELETE FROM cache WHERE NOT {ALIVE}', (time.time(),))
+            (count,) = db.execute('SELECT COUNT(*) FROM cache').fetchone()
+            if count > self._max_entries:
+                if self._cull_frequency == 0:
+                    db.execute('DELETE FROM cache')
+                    return
+                excess = count - self._max_entries
+                cut = max(excess, count // self._cull_frequency)
+                db.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                    'ORDER BY accessed LIMIT ?)', (cut,))
+
+        self._write(cull)
+
+    def close(self, **kwargs):
+        # Соединение живёт весь срок потока: открывать файл на каждый
+        # запрос дороже, чем держать его.
+        pass
+
+
+@contextmanager
+def isolated_caches(**overrides):
+    """Все кэши из CACHES с теми же бэкендами, но с файлами во временном
+    каталоге, который удаляется на выходе: кэш сайта не видит ни записей,
+    ни очистки. overrides - другие настройки на то же время.
+
+    Подменяются кэши, которые берутся из caches при обращении: прокси
+    django.core.cache.cache и KVStore sorl-thumbnail (он читает
+    caches[THUMBNAIL_CACHE] каждый раз). Объект, взятый из caches до
+    входа и сохранённый, по-прежнему пишет в кэш сайта. Таблица KVStore
+    в базе - не кэш и не подменяется."""
+    directory = tempfile.mkdtemp(prefix='yatube-cache-')
+    caches = {alias: {**config,
+                      'LOCATION': os.path.join(directory, f'{alias}.sqlite3')}
+              for alias, config in settings.CACHES.items()}
+    try:
+        with override_settings(CACHES=caches, **overrides):
+            yield
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,43 @@
+"""Счётчики поколений для инвалидации кэша.
+
+Ключ закэшированного фрагмента включает номера поколений тех данных,
+из которых он собран. Изменение данных увеличивает номер, и старые
+записи просто перестают читаться, так что фрагменты можно держать
+в кэше долго, а свежий контент виден сразу.
+"""
+import time
+
+from django.core.cache import cache
+
+KEY_PREFIX = 'gen:'
+
+
+def _initial():
+    # Начинаем со времени, а не с нуля: после cache.clear() номера не
+    # совпадут с прежними, и старый фрагмент не выдаст себя за свежий.
+    return int(time.time() * 1000)
+
+
+def get_many(*scopes):
+    """Текущие номера поколений в порядке scopes."""
+    keys = [KEY_PREFIX + scope for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, _initial(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def version(*scopes):
+    """Строка для ключа кэша, меняющаяся при смене любого поколения."""
+    return '.'.join(str(number) for number in get_many(*scopes))
+
+
+def bump(*scopes):
+    for scope in scopes:
+        key = KEY_PREFIX + scope
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _initial(), None)
@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache import SQLiteCache
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает скорость бэкендов кэша на типичных операциях.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keys', type=int, default=2000)
+        parser.add_argument('--batch', type=int, default=10,
+                            help='Ключей в одном get_many, как на ленте.')
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        params = {'OPTIONS': {'MAX_ENTRIES': options['keys'] * 2}}
+        backends = {
+            'locmem': LocMemCache('benchmark', params),
+            'filebased': FileBasedCache(
+                os.path.join(directory, 'files'), params),
+            'sqlite': SQLiteCache(
+                os.path.join(directory, 'cache.sqlite3'), params),
+            'default': caches['default'],
+        }
+        try:
+            for name, cache in backends.items():
+                self.run(name, cache, options['keys'], options['batch'])
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def run(self, name, cache, total, batch):
+        keys = [f'bench:{i}' for i in range(total)]
+        value = 'x' * 2048
+        results = {}
+
+        start = time.perf_counter()
+        for key in keys:
+            cache.set(key, value)
+        results['set'] = total / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for key in keys:
+            cache.get(key)
+        results['get'] = total / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for i in range(0, total, batch):
+            cache.get_many(keys[i:i + batch])
+        results['get_many'] = total / (time.perf_counter() - start)
+
+        cache.set('bench:counter', 0)
+        start = time.perf_counter()
+        for _ in range(total):
+            cache.incr('bench:counter')
+        results['incr'] = total / (time.perf_counter() - start)
+
+        cache.delete_many(keys + ['bench:counter'])
+        self.stdout.write(name + ': ' + ', '.join(
+            f'{operation} {rate:.0f}/с'
+            for operation, rate in results.items()))
@@ -0,0 +1,14 @@
+from django.db import models
+
+
+class Blob(models.Model):
+    """Файл в ContentAddressedStorage и число ссылок на него."""
+    name = models.CharField(max_length=255, primary_key=True)
+    refs = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'Файлы'
+
+    def __str__(self):
+        return f'{self.name} ({self.refs})'
@@ -0,0 +1,157 @@
+"""Бюджет SQL-запросов на запрос и поиск N+1.
+
+QueryBudgetMiddleware считает запросы каждого HTTP-запроса через
+execute_wrapper (DEBUG не нужен) и сравнивает их с бюджетом view,
+объявленным декоратором @query_budget. Кроме общего числа проверяется
+форма запросов: один и тот же SQL, который отличается только
+параметрами и повторяется больше QUERY_REPEAT_LIMIT раз, - почти
+наверняка запрос на каждую строку списка (N+1). Нарушения пишутся
+в лог, а при QUERY_BUDGET_RAISE роняют запрос исключением, так что
+в тестах бюджет нельзя тихо перерасходовать.
+"""
+import logging
+import re
+import threading
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# IN (%s, %s, ...) разной длины - одна и та же форма.
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+# Точки сохранения отличаются только именем и N+1 не означают.
+SAVEPOINT = re.compile(r'(RELEASE |ROLLBACK TO )?SAVEPOINT ')
+
+_local = threading.local()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def shape(sql):
+    """SQL без различий в параметрах."""
+    return IN_LIST.sub('IN (...)', sql)
+
+
+def query_budget(limit):
+    """Объявляет, сколько запросов может сделать view."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+@contextmanager
+def unchecked():
+    """Запросы блока не идут ни в бюджет, ни в поиск N+1. Для редких
+    путей, которые поштучны заведомо, вроде построения миниатюры при
+    первом показе."""
+    depth = getattr(_local, 'unchecked', 0)
+    _local.unchecked = depth + 1
+    try:
+        yield
+    finally:
+        _local.unchecked = depth
+
+
+@contextmanager
+def expected_repeats():
+    """Повторы запросов блока ограничены самим кодом (например, по
+    выборке на каждого pull-автора ленты): они идут в бюджет, но за
+    N+1 не считаются."""
+    depth = getattr(_local, 'expected', 0)
+    _local.expected = depth + 1
+    try:
+        yield
+    finally:
+        _local.expected = depth
+
+
+class QueryLog:
+    """Формы выполненных запросов; ставится как execute_wrapper."""
+
+    def __init__(self):
+        self.shapes = Counter()
+        self.expected = 0
+        self.unchecked = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, 'unchecked', 0):
+            self.unchecked += 1
+        elif getattr(_local, 'expected', 0):
+            self.expected += 1
+        else:
+            self.shapes[shape(sql)] += 1
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return sum(self.shapes.values()) + self.expected
+
+    @contextmanager
+    def capture(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    def repeated(self, limit):
+        """Формы, повторённые больше limit раз, с числом повторов."""
+        return [(sql, count) for sql, count in self.shapes.most_common()
+                if count > limit and not SAVEPOINT.match(sql)]
+
+    def problems(self, budget=None, repeat_limit=None):
+        found = []
+        if budget is not None and len(self) > budget:
+            found.append(f'{len(self)} запросов при бюджете {budget}')
+        if repeat_limit is None:
+            repeat_limit = settings.QUERY_REPEAT_LIMIT
+        for sql, count in self.repeated(repeat_limit):
+            found.append(f'{count} раз: {sql}')
+        return found
+
+
+@contextmanager
+def assert_budget(limit=None, repeat_limit=None):
+    """Для тестов и команд: QueryBudgetExceeded, если код в блоке
+    сделал больше limit запросов или повторяет запрос одной формы."""
+    log = QueryLog()
+    with log.capture():
+        yield log
+    problems = log.problems(limit, repeat_limit)
+    if problems:
+        raise QueryBudgetExceeded('; '.join(problems))
+
+
+class QueryBudgetMiddleware:
+    """Проверяет каждый запрос по бюджету его view. Стоит первым,
+    чтобы считать и запросы сессии и пользователя."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        log = QueryLog()
+        with log.capture():
+            response = self.get_response(request)
+        if response.status_code >= 500:
+            # Страница ошибки тоже делает запросы: превышение бюджета
+            # скрыло бы настоящее исключение.
+            return response
+        budget = getattr(request, '_query_budget',
+                         settings.QUERY_BUDGET_DEFAULT)
+        problems = log.problems(budget)
+        if problems:
+            message = f'{request.method} {request.path}: ' + '; '.join(
+                problems)
+            if settings.QUERY_BUDGET_RAISE:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = getattr(view_func, 'query_budget',
+                                        settings.QUERY_BUDGET_DEFAULT)
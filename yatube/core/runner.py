@@ -0,0 +1,30 @@
+"""Окружение тестов поверх обычных настроек.
+
+Файл кэша сайта переживает перезапуск, а тесты не должны видеть ни его,
+ни друг друга между прогонами. Поэтому на время прогона кэш - тот же
+бэкенд из CACHES, но с файлом во временном каталоге. Миниатюры
+строятся сразу, без фонового потока: он писал бы в тестовую базу
+параллельно с тестом и её сбросом. manage.py test
+включает окружение через TEST_RUNNER, pytest - через корневой
+conftest.py.
+"""
+from contextlib import ExitStack
+
+from django.test.runner import DiscoverRunner
+
+from .cache import isolated_caches
+
+
+def isolated_settings():
+    return isolated_caches(THUMBNAIL_BACKGROUND=False)
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._environment = ExitStack()
+        self._environment.enter_context(isolated_settings())
+
+    def teardown_test_environment(self, **kwargs):
+        self._environment.close()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,114 @@
+"""Хранилище файлов с адресацией по содержимому.
+
+Имя файла - SHA-256 его содержимого, разложенный по вложенным каталогам:
+posts/ab/cd/abcd…ef.jpg. Каталоги остаются маленькими при любом числе
+файлов, а одинаковые загрузки занимают место один раз. Каждое сохранение
+добавляет ссылку в Blob, delete() снимает одну ссылку, и файл удаляется
+с диска, когда ссылок не осталось. Удаляется он только после коммита
+транзакции, которая сняла последнюю ссылку: откат оставит файл на месте.
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+from .models import Blob
+
+SHARD_DEPTH = 2
+SHARD_WIDTH = 2
+CONTENT_NAME = re.compile(
+    r'(^|/)' + r'[0-9a-f]{%d}/' % SHARD_WIDTH * SHARD_DEPTH
+    + r'[0-9a-f]{64}(\.\w+)?$')
+
+
+def digest(content):
+    sha = hashlib.sha256()
+    for chunk in content.chunks():
+        sha.update(chunk)
+    content.seek(0)
+    return sha.hexdigest()
+
+
+def content_name(name, hexdigest):
+    """Имя файла по хэшу в каталоге исходного имени, с его расширением."""
+    directory = os.path.dirname(name)
+    extension = os.path.splitext(name)[1].lower()
+    shards = [hexdigest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH]
+              for i in range(SHARD_DEPTH)]
+    return '/'.join([directory, *shards, hexdigest + extension]).lstrip('/')
+
+
+def is_content_name(name):
+    return CONTENT_NAME.search(name) is not None
+
+
+def acquire(name, count=1):
+    Blob.objects.bulk_create([Blob(name=name)], ignore_conflicts=True)
+    Blob.objects.filter(name=name).update(refs=F('refs') + count)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Одинаковое имя значит одинаковое содержимое: конфликта нет.
+        return name
+
+    def _save(self, name, content):
+        name = content_name(name, digest(content))
+        with transaction.atomic():
+            # Сначала ссылка, потом проверка файла: взятую ссылку
+            # параллельный delete() уже не увидит нулевой.
+            acquire(name)
+            if not self.exists(name):
+                self._write(name, content)
+        return name
+
+    def _write(self, name, content):
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Пишем рядом и переименовываем: параллельная загрузка того же
+        # содержимого не увидит недописанный файл.
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(handle, 'wb') as output:
+                for chunk in content.chunks():
+                    output.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporary, self.file_permissions_mode)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    def adopt(self, name, refs):
+        """Копирует файл, сохранённый до этого хранилища, под имя по хэшу
+        и записывает на него refs ссылок. Старый файл остаётся: его
+        удаляют, когда ссылки на него уже переписаны."""
+        with self.open(name) as content:
+            new_name = content_name(name, digest(content))
+            with transaction.atomic():
+                acquire(new_name, refs)
+                if not self.exists(new_name):
+                    self._write(new_name, content)
+        return new_name
+
+    def delete(self, name):
+        """Снимает одну ссылку; файл удаляется после коммита, если
+        ссылок к тому времени не осталось. Файлы без записи в Blob
+        (загруженные до этого хранилища) не трогаем."""
+        Blob.objects.filter(name=name, refs__gt=0).update(
+            refs=F('refs') - 1)
+        transaction.on_commit(lambda: self._collect(name))
+
+    def _collect(self, name):
+        # Ссылку могли снова взять, пока транзакция delete() шла:
+        # проверяем заново под той же блокировкой, что и acquire().
+        with transaction.atomic():
+            if Blob.objects.filter(name=name, refs=0).delete()[0]:
+                super().delete(name)
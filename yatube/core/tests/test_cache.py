@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from sorl.thumbnail import default
+
+from core.cache import SQLiteCache, isolated_caches
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_roundtrip_and_shared_file(self):
+        """Значения читаются обратно и видны другому экземпляру."""
+        self.cache.set('text', 'значение')
+        self.cache.set_many({'number': 7, 'data': {'a': [1, 2]}})
+        other = self.make_cache()
+        self.assertEqual(other.get('text'), 'значение')
+        self.assertEqual(
+            other.get_many(['number', 'data', 'missing']),
+            {'number': 7, 'data': {'a': [1, 2]}})
+        other.delete('text')
+        self.assertIsNone(self.cache.get('text'))
+
+    def test_expiry_and_add(self):
+        """Просроченная запись не читается, и add может её заменить."""
+        self.cache.set('key', 'old', timeout=0.05)
+        self.assertFalse(self.cache.add('key', 'new'))
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_incr_is_atomic(self):
+        """Параллельные incr не теряют приращения."""
+        self.cache.set('counter', 0)
+
+        def work():
+            cache = self.make_cache()
+            for _ in range(50):
+                cache.incr('counter')
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_size_is_bounded(self):
+        """При переполнении вытесняются давно не читанные записи."""
+        cache = self.make_cache(MAX_ENTRIES=10, CULL_PROBABILITY=1,
+                                ACCESS_RESOLUTION=0)
+        cache.set('hot', 1)
+        for i in range(30):
+            cache.get('hot')
+            cache.set(f'key{i}', i)
+        self.assertEqual(cache.get('hot'), 1)
+        count = cache._db.execute('SELECT COUNT(*) FROM cache').fetchone()
+        self.assertLessEqual(count[0], 11)
+
+
+class IsolatedCachesTests(SimpleTestCase):
+    def test_site_cache_untouched(self):
+        """Записи и очистка внутри isolated_caches() - в отдельном файле,
+        в том числе у KVStore миниатюр sorl-thumbnail."""
+        cache.set('isolated', 'site')
+        self.addCleanup(cache.delete, 'isolated')
+        outer = default.kvstore.cache._path
+        with isolated_caches():
+            self.assertNotEqual(default.kvstore.cache._path, outer)
+            self.assertIsNone(default.kvstore.cache.get('isolated'))
+            default.kvstore.cache.set('isolated', 'inner')
+            cache.clear()
+        self.assertEqual(default.kvstore.cache._path, outer)
+        self.assertEqual(cache.get('isolated'), 'site')
@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import path
+
+from core import queries
+
+User = get_user_model()
+
+
+@queries.query_budget(2)
+def chatty(request):
+    for user in User.objects.order_by('pk'):
+        User.objects.get(pk=user.pk)
+    return HttpResponse('ok')
+
+
+@queries.query_budget(10)
+def single(request):
+    return HttpResponse(str(User.objects.count()))
+
+
+@queries.query_budget(2)
+def broken(request):
+    for _ in range(3):
+        User.objects.count()
+    raise ValueError('настоящая ошибка')
+
+
+urlpatterns = [
+    path('chatty/', chatty),
+    path('broken/', broken),
+    path('single/', single),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create(
+            User(username=f'user{number}') for number in range(8))
+
+    def lookups(self, count):
+        for user in User.objects.order_by('pk')[:count]:
+            User.objects.get(pk=user.pk)
+
+    def test_shape_ignores_in_list_length(self):
+        """IN-списки разной длины - одна форма запроса."""
+        self.assertEqual(
+            queries.shape('SELECT 1 WHERE id IN (%s, %s, %s)'),
+            queries.shape('SELECT 1 WHERE id IN (%s)'))
+
+    def test_repeated_shape_is_reported(self):
+        """Запрос одной формы больше QUERY_REPEAT_LIMIT раз - N+1."""
+        with queries.assert_budget(repeat_limit=5):
+            self.lookups(5)
+        with self.assertRaisesMessage(queries.QueryBudgetExceeded,
+                                      '6 раз: SELECT'):
+            with queries.assert_budget(repeat_limit=5):
+                self.lookups(6)
+
+    def test_budget_is_enforced(self):
+        with self.assertRaisesMessage(queries.QueryBudgetExceeded,
+                                      '3 запросов при бюджете 2'):
+            with queries.assert_budget(2):
+                self.lookups(2)
+
+    def test_unchecked_and_expected_repeats(self):
+        """unchecked() не идёт никуда, expected_repeats() - только
+        в бюджет."""
+        with queries.assert_budget(1, repeat_limit=1) as log:
+            with queries.unchecked():
+                self.lookups(8)
+        self.assertEqual(log.unchecked, 9)
+        with self.assertRaisesMessage(queries.QueryBudgetExceeded,
+                                      'при бюджете 5'):
+            with queries.assert_budget(5, repeat_limit=1):
+                with queries.expected_repeats():
+                    self.lookups(8)
+        with queries.assert_budget(repeat_limit=1) as log:
+            with queries.expected_repeats():
+                self.lookups(8)
+        self.assertEqual(len(log), 9)
+
+    def test_middleware_raises(self):
+        """При QUERY_BUDGET_RAISE view сверх бюджета роняет запрос."""
+        with self.assertRaises(queries.QueryBudgetExceeded):
+            self.client.get('/chatty/')
+        self.assertEqual(self.client.get('/single/').content, b'8')
+
+    def test_middleware_keeps_server_errors(self):
+        """Запросы при сборке страницы 500 не подменяют настоящую ошибку
+        превышением бюджета."""
+        with self.assertRaisesMessage(ValueError, 'настоящая ошибка'):
+            self.client.get('/broken/')
+
+    @override_settings(QUERY_BUDGET_RAISE=False)
+    def test_middleware_logs(self):
+        """Без QUERY_BUDGET_RAISE нарушение пишется в лог."""
+        with self.assertLogs('core.queries', 'WARNING') as logs:
+            response = self.client.get('/chatty/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('GET /chatty/: 9 запросов при бюджете 2',
+                      logs.output[0])
+        self.assertIn('8 раз: SELECT', logs.output[0])
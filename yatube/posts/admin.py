@@ -1,14 +1,191 @@
+import datetime
+
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.views.main import (
+    ALL_VAR, ORDER_VAR, PAGE_VAR, ChangeList)
+from django.db.models import Min, QuerySet
+from django.utils import timezone
+
+from core import queries
+from . import search
 from .models import Post, Group, Comment
+from .paginators import CursorPaginator, EstimatedCountPaginator
+from .widgets import Autocomplete
+
+CURSOR_VAR = 'cursor'
+
+
+def _truncate(day, kind):
+    if kind == 'year':
+        return day.replace(month=1, day=1)
+    if kind == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _following(day, kind):
+    if kind == 'year':
+        return day.replace(year=day.year + 1)
+    if kind == 'month':
+        return (day + datetime.timedelta(days=32)).replace(day=1)
+    return day + datetime.timedelta(days=1)
+
+
+class IndexedDatesQuerySet(QuerySet):
+    """dates() обходит индекс по дате скачками: один MIN() на каждый
+    найденный год, месяц или день вместо SELECT DISTINCT по всем
+    строкам. Им пользуется date_hierarchy админки."""
+
+    def dates(self, field_name, kind, order='ASC'):
+        if kind not in ('year', 'month', 'day'):
+            return super().dates(field_name, kind, order)
+        result = []
+        queryset = self.order_by()
+        # По MIN() на найденный год, месяц или день: в drill-down их
+        # не больше 12 или 31, а лет - сколько живёт сайт.
+        with queries.expected_repeats():
+            while True:
+                first = queryset.aggregate(first=Min(field_name))['first']
+                if first is None:
+                    break
+                result.append(_truncate(self._date(first), kind))
+                start = _following(result[-1], kind)
+                if isinstance(first, datetime.datetime):
+                    start = datetime.datetime.combine(start, datetime.time())
+                    if timezone.is_aware(first):
+                        start = timezone.make_aware(start, timezone.utc)
+                queryset = self.order_by().filter(
+                    **{f'{field_name}__gte': start})
+        return result if order == 'ASC' else result[::-1]
+
+    @staticmethod
+    def _date(value):
+        # Как и QuerySet.dates(), дату из DateTimeField берём в UTC.
+        if not isinstance(value, datetime.datetime):
+            return value
+        if timezone.is_aware(value):
+            value = value.astimezone(timezone.utc)
+        return value.date()
+
+
+class KeysetChangeList(ChangeList):
+    """Список объектов админки с курсорной навигацией ?cursor=.
 
+    При сортировке по умолчанию страницы выбираются курсором по
+    cursor_ordering модели, без OFFSET: дальние страницы стоят столько
+    же, сколько первая. Сортировка по колонке, ?p= и «Показать все»
+    работают по-старому, номерными страницами.
+    """
 
-class PostAdmin(admin.ModelAdmin):
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR)
+        self.keyset = not {ORDER_VAR, PAGE_VAR, ALL_VAR} & set(request.GET)
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Смена фильтра или поиска начинает список с первой страницы.
+        new_params = dict(new_params or {})
+        new_params.setdefault(CURSOR_VAR, None)
+        return super().get_query_string(new_params, remove)
+
+    def get_results(self, request):
+        if not self.keyset:
+            return super().get_results(request)
+        ordering = self.model_admin.cursor_ordering
+        # Курсором выбираем только ключи страницы, по индексу; строки
+        # с JOIN читаются вторым запросом по id. Нужен именно QuerySet:
+        # по нему list_editable строит формы.
+        keys = self.queryset.select_related(None).only(
+            *(name.lstrip('-') for name in ordering))
+        paginator = CursorPaginator(keys, self.list_per_page, ordering)
+        rows = paginator.get_cursor_page(self.cursor)
+        self.result_list = self.queryset.filter(
+            pk__in=[row.pk for row in rows]).order_by(*ordering)
+        self.result_count = self.model_admin.get_paginator(
+            request, self.queryset, self.list_per_page).count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.can_show_all = False
+        self.multi_page = paginator.has_previous or paginator.has_next
+        self.paginator = paginator
+        self.first_url = self.get_query_string()
+        self.previous_url, self.next_url = (
+            cursor and self.get_query_string({CURSOR_VAR: cursor})
+            for cursor in (paginator.previous_cursor, paginator.next_cursor))
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Общие настройки админки для таблиц на миллионы строк: оценка
+    числа строк вместо COUNT(*), курсорные страницы, date_hierarchy
+    по индексу и подсказки вместо <select> на всю таблицу для полей
+    из autocomplete_kinds (поле -> вид в posts.autocomplete)."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Два поля по убыванию, по которым есть индекс; задаёт подкласс.
+    cursor_ordering = None
+    autocomplete_kinds = {}
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return IndexedDatesQuerySet(queryset.model, queryset.query,
+                                    queryset.db)
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        kind = self.autocomplete_kinds.get(db_field.name)
+        if kind and 'widget' not in kwargs:
+            kwargs['widget'] = Autocomplete(kind, using=kwargs.get('using'))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class PostAdmin(LargeTableAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group',)
+    list_select_related = ('author', 'group')
     list_editable = ('group',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    cursor_ordering = ('-pub_date', '-pk')
+    autocomplete_kinds = {'author': 'users', 'group': 'groups'}
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо LIKE '%слово%' по всей таблице - полнотекстовый индекс.
+        query = search.match_query(search_term)
+        if not query or not search.available():
+            return super().get_search_results(
+                request, queryset, search_term)
+        return queryset.filter(pk__in=search.matching_ids(query)), False
+
+    def get_changelist_formset(self, request, **kwargs):
+        # В строках списка подсказки дали бы по запросу на строку ради
+        # подписи выбранной группы: там остаётся обычный <select>.
+        kwargs.setdefault('widgets', {'group': forms.Select})
+        return super().get_changelist_formset(request, **kwargs)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(
+            db_field, request, **kwargs)
+        if (db_field.name == 'group' and request is not None
+                and not isinstance(formfield.widget, Autocomplete)):
+            # Список групп в каждой строке list_editable читаем один раз
+            # на запрос, а не по разу на строку.
+            if not hasattr(request, '_group_choices'):
+                # Без list(): он спросил бы у итератора len() - COUNT(*).
+                request._group_choices = [
+                    choice for choice in formfield.choices]
+            formfield.choices = request._group_choices
+        return formfield
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('slug', 'title', 'description')
@@ -17,12 +194,17 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = ('post', 'author', 'text', 'created',)
+    list_select_related = ('post', 'author')
     list_editable = ('text',)
     search_fields = ('text',)
     list_filter = ('created',)
     list_display_links = None
+    date_hierarchy = 'created'
+    ordering = ('-created',)
+    cursor_ordering = ('-created', '-pk')
+    autocomplete_kinds = {'post': 'posts', 'author': 'users'}
     empty_value_display = '-пусто-'
 
 
@@ -0,0 +1,101 @@
+"""Подсказки для полей автора, группы и поста в формах.
+
+Формы больше не выводят в <select> всю таблицу: виджет показывает
+только выбранное значение, а варианты запрашивает у autocomplete-view
+по мере ввода. Имена и названия ищутся по префиксу диапазоном
+по индексу (key >= 'ко' AND key < 'ко\\U0010ffff'), а не LIKE, который
+SQLite по индексу не ведёт. Диапазон идёт по ключу - имени строчными
+(Group.title_key, UserStats.username_key), так что регистр не важен;
+строчные считает Python, потому что NOCASE и lower() в SQLite знают
+только ASCII. Посты ищутся полнотекстовым индексом.
+Ответы кэшируются с номерами поколений данных, так что правка группы
+или новый пользователь видны в подсказках сразу.
+"""
+import hashlib
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from core import generations
+from . import search
+from .models import Group, Post
+
+User = get_user_model()
+
+LIMIT = 20
+REBUILD_BATCH_SIZE = 500
+# Больше любого символа: верхняя граница диапазона префикса.
+MAX_CHAR = '\U0010ffff'
+
+
+def _prefix_range(queryset, key, term):
+    """Первые LIMIT строк, у которых ключ (строчными) начинается с term."""
+    return queryset.filter(
+        **{f'{key}__gte': term, f'{key}__lt': term + MAX_CHAR}
+    ).order_by(key)[:LIMIT]
+
+
+def rebuild():
+    """Заполняет Group.title_key у групп, вставленных мимо save()
+    (bulk_create); ключи имён пересобирает counters.recount()."""
+    groups = (Group.objects.order_by().values_list('pk', 'title')
+              .iterator(chunk_size=REBUILD_BATCH_SIZE))
+    while True:
+        batch = [Group(pk=pk, title_key=title.lower())
+                 for pk, title in islice(groups, REBUILD_BATCH_SIZE)]
+        if not batch:
+            return
+        Group.objects.bulk_update(batch, ['title_key'])
+
+
+def _groups(term):
+    groups = _prefix_range(Group.objects.only('title'), 'title_key', term)
+    return [(group.pk, group.title) for group in groups]
+
+
+def _users(term):
+    users = _prefix_range(
+        User.objects.only('username', 'first_name', 'last_name'),
+        'stats__username_key', term)
+    return [(user.pk, _user_label(user)) for user in users]
+
+
+def _user_label(user):
+    full_name = user.get_full_name()
+    return f'{user.username} ({full_name})' if full_name else user.username
+
+
+def _posts(term):
+    posts = Post.objects.only('text').order_by('-pub_date', '-pk')
+    if term.isdigit():
+        posts = posts.filter(pk=term)
+    elif not search.available():
+        posts = posts.filter(text__icontains=term)
+    elif search.match_query(term):
+        posts = posts.filter(
+            pk__in=search.matching_ids(search.match_query(term)))
+    return [(post.pk, f'{post.pk}: {post.text[:50]}')
+            for post in posts[:LIMIT]]
+
+
+# Вид подсказки: функция поиска и поколения данных, от которых она зависит.
+KINDS = {
+    'groups': (_groups, ('groups',)),
+    'users': (_users, ('users', 'accounts')),
+    'posts': (_posts, ('posts',)),
+}
+
+
+def suggest(kind, term):
+    """До LIMIT пар (id, подпись) для введённой строки, из кэша."""
+    find, scopes = KINDS[kind]
+    term = term.strip().lower()
+    digest = hashlib.md5(term.encode()).hexdigest()
+    key = f'autocomplete:{kind}:{generations.version(*scopes)}:{digest}'
+    results = cache.get(key)
+    if results is None:
+        results = find(term)
+        cache.set(key, results, settings.AUTOCOMPLETE_CACHE_TIMEOUT)
+    return results
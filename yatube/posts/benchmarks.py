@@ -0,0 +1,202 @@
+"""Замер страниц posts.views через тестовый клиент Django.
+
+Для каждого сценария - задержка p50/p95/p99, число SQL-запросов,
+попадания и промахи кэша и размер ответа. Результаты сохраняются в
+JSON, и прогон можно сравнить с прошлым: regressions() перечисляет
+сценарии, где p95 вырос больше порога или запросов стало больше.
+Рассчитан на данные seed_data; пишущие сценарии выполняются в
+транзакции, которая откатывается после замера, а кэш на время замера
+свой, во временном каталоге: кэш сайта замер не читает и не очищает.
+"""
+import math
+import statistics
+import time
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.cache import isolated_caches
+from . import comments
+from .models import Comment, Follow, Group, Post, UserStats
+
+Scenario = namedtuple('Scenario', 'name method url data user')
+
+PERCENTILES = (50, 95, 99)
+MISSING = object()
+
+
+class Rollback(Exception):
+    pass
+
+
+class NoData(Exception):
+    pass
+
+
+def percentile(values, rank):
+    """Значение, ниже которого rank процентов замеров (nearest rank)."""
+    values = sorted(values)
+    return values[max(math.ceil(rank / 100 * len(values)) - 1, 0)]
+
+
+@contextmanager
+def counting_caches():
+    """Считает попадания и промахи get/get_many во всех кэшах."""
+    stats = Counter()
+    patched = []
+    for cache in caches.all():
+        get, get_many = cache.get, cache.get_many
+        # Базовый get_many зовёт get по ключу: их не считаем дважды.
+        nested = []
+
+        def counted_get(key, default=None, version=None, get=get,
+                        nested=nested):
+            value = get(key, MISSING, version=version)
+            if not nested:
+                stats['hits' if value is not MISSING else 'misses'] += 1
+            return default if value is MISSING else value
+
+        def counted_get_many(keys, version=None, get_many=get_many,
+                             nested=nested):
+            keys = list(keys)
+            nested.append(True)
+            try:
+                found = get_many(keys, version=version)
+            finally:
+                nested.pop()
+            stats['hits'] += len(found)
+            stats['misses'] += len(keys) - len(found)
+            return found
+
+        cache.get, cache.get_many = counted_get, counted_get_many
+        patched.append(cache)
+    try:
+        yield stats
+    finally:
+        for cache in patched:
+            del cache.get, cache.get_many
+
+
+def scenarios():
+    """Сценарии на самых нагруженных объектах базы: крупнейшая группа,
+    самый плодовитый автор, самый обсуждаемый пост и читатель
+    с наибольшим числом подписок."""
+    post = Post.objects.order_by('-comment_count', '-pk').first()
+    reader = UserStats.objects.order_by('-following_count').first()
+    author = UserStats.objects.order_by('-posts_count').first()
+    group = (Group.objects.annotate(total=Count('posts'))
+             .order_by('-total').first())
+    if not (post and reader and author and group):
+        raise NoData('Нужны посты, группы и пользователи: '
+                     'запустите seed_data.')
+    reader = reader.user
+    pages = comments.paginator(post.pk)
+    pages.get_cursor_page()
+    return [
+        Scenario('index', 'get', reverse('posts:index'), None, None),
+        Scenario('group_posts', 'get',
+                 reverse('posts:group_list', args=[group.slug]), None, None),
+        Scenario('profile', 'get',
+                 reverse('posts:profile', args=[author.user.username]),
+                 None, None),
+        Scenario('post_detail', 'get',
+                 reverse('posts:post_detail', args=[post.pk]), None, None),
+        Scenario('post_comments', 'get',
+                 reverse('posts:post_comments', args=[post.pk]),
+                 {'cursor': pages.next_cursor} if pages.has_next else None,
+                 None),
+        Scenario('follow_index', 'get', reverse('posts:follow_index'),
+                 None, reader),
+        Scenario('post_create', 'post', reverse('posts:post_create'),
+                 {'text': 'Замер #benchmark', 'group': group.pk}, reader),
+        Scenario('add_comment', 'post',
+                 reverse('posts:add_comment', args=[post.pk]),
+                 {'text': 'Замер'}, reader),
+    ]
+
+
+def measure(scenario, runs, warmup=0, cold=False):
+    """Сводка runs запросов сценария после warmup разогревочных.
+    Кэши - отдельные на время замера (см. isolated_caches)."""
+    client = Client()
+    if scenario.user:
+        client.force_login(scenario.user)
+    send = getattr(client, scenario.method)
+    samples = []
+    with isolated_caches():
+        for number in range(warmup + runs):
+            if cold:
+                for cache in caches.all():
+                    cache.clear()
+            # Журнал запросов ограничен 9000 строк: после этого
+            # CaptureQueriesContext видел бы ноль новых.
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as queries, \
+                    counting_caches() as stats:
+                started = time.perf_counter()
+                response = send(scenario.url, scenario.data)
+                elapsed = (time.perf_counter() - started) * 1000
+            if number >= warmup:
+                samples.append((elapsed, len(queries), stats['hits'],
+                                stats['misses'], len(response.content)))
+    timings, counts, hits, misses, sizes = zip(*samples)
+    summary = {f'p{rank}_ms': round(percentile(timings, rank), 3)
+               for rank in PERCENTILES}
+    summary.update(
+        status=response.status_code,
+        queries=round(statistics.median(counts)),
+        queries_max=max(counts),
+        cache_hits=round(statistics.mean(hits), 2),
+        cache_misses=round(statistics.mean(misses), 2),
+        bytes=round(statistics.median(sizes)),
+    )
+    return summary
+
+
+def dataset():
+    return {model._meta.model_name: model.objects.count()
+            for model in (Post, Comment, Follow, Group)}
+
+
+def run(runs=50, warmup=5, cold=False, names=None):
+    """Замеряет сценарии и откатывает всё, что они записали."""
+    results = {}
+    try:
+        with transaction.atomic():
+            report = {'created': timezone.now().isoformat(),
+                      'runs': runs, 'warmup': warmup, 'cold': cold,
+                      'dataset': dataset()}
+            for scenario in scenarios():
+                if names and scenario.name not in names:
+                    continue
+                results[scenario.name] = measure(scenario, runs, warmup,
+                                                 cold)
+            raise Rollback
+    except Rollback:
+        pass
+    report['views'] = results
+    return report
+
+
+def regressions(baseline, current, threshold=0.2):
+    """Сценарии, которые стали медленнее порога или делают больше
+    запросов, чем в baseline."""
+    found = []
+    for name, result in current['views'].items():
+        before = baseline.get('views', {}).get(name)
+        if before is None:
+            continue
+        if result['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            found.append(f'{name}: p95 {before["p95_ms"]:.1f} -> '
+                         f'{result["p95_ms"]:.1f} мс')
+        if result['queries'] > before['queries']:
+            found.append(f'{name}: запросов {before["queries"]} -> '
+                         f'{result["queries"]}')
+    return found
@@ -0,0 +1,53 @@
+"""Массовая загрузка строк через bulk_create, мимо сигналов.
+
+Ею пользуются команды import_posts и seed_data: на время вставки поля
+auto_now и auto_now_add берут даты из данных, а после вставки
+rebuild_derived() пересобирает всё, что поддерживают сигналы.
+"""
+import time
+from contextlib import contextmanager
+
+from core import generations
+from . import autocomplete, counters, feeds, search, tags
+
+# Поколения всех кэшированных лент и карточек (см. posts.versions).
+SCOPES = ('posts', 'users', 'groups', 'accounts')
+
+
+@contextmanager
+def dates_from_dump(models):
+    """bulk_create заменил бы значения auto_now и auto_now_add текущим
+    временем, как при обычном save(). На время загрузки поля берут даты
+    из дампа, как loaddata; чего в дампе нет, заполняется вызывающим."""
+    fields = [field for model in models for field in model._meta.fields
+              if getattr(field, 'auto_now', False)
+              or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield fields
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def rebuild_derived():
+    """Пересобирает всё, что bulk_create обошёл мимо сигналов: счётчики,
+    ленты, хештеги, ключи подсказок и поисковый индекс.
+    Возвращает [(шаг, секунды)]."""
+    steps = (
+        ('счётчики', counters.recount),
+        ('подсказки', autocomplete.rebuild),
+        ('числа постов', counters.reconcile_post_counts),
+        ('ленты', feeds.rebuild),
+        ('хештеги', tags.rebuild),
+        ('поиск', search.install),
+        ('кэш', lambda: generations.bump(*SCOPES)),
+    )
+    timings = []
+    for name, step in steps:
+        started = time.monotonic()
+        step()
+        timings.append((name, time.monotonic() - started))
+    return timings
@@ -0,0 +1,51 @@
+"""Комментарии поста порциями.
+
+Страница поста показывает только первые COMMENTS_PER_PAGE комментариев,
+остальные подгружает кнопка «Показать ещё»: отдельный view отдаёт HTML
+следующей порции, без шапки и формы. Порция выбирается курсором по
+(created, id) по индексу posts_comment_post_date_idx, авторы приходят тем
+же запросом. Готовый HTML порции кэшируется; ключ включает поколение
+комментариев поста (его поднимают сигналы комментариев) и имён
+пользователей, так что новый комментарий виден сразу.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from . import versions
+from .models import Comment
+from .paginators import CursorPaginator, InvalidCursor
+
+ORDERING = ('created', 'pk')
+
+
+def paginator(post_id):
+    comments = (Comment.objects.filter(post_id=post_id)
+                .select_related('author').order_by(*ORDERING)
+                .only('text', 'created', 'post_id', 'author__username'))
+    return CursorPaginator(comments, settings.COMMENTS_PER_PAGE, ORDERING)
+
+
+def chunk(post_id, cursor=None):
+    """HTML порции комментариев после cursor (с начала, если курсора нет
+    или он битый) и кнопки следующей порции."""
+    pages = paginator(post_id)
+    try:
+        if cursor:
+            pages.decode(cursor)
+    except InvalidCursor:
+        cursor = None
+    digest = hashlib.md5((cursor or '').encode()).hexdigest()
+    key = f'comments:{post_id}:{versions.comments_version(post_id)}:{digest}'
+    html = cache.get(key)
+    if html is None:
+        page = pages.get_cursor_page(cursor)
+        html = render_to_string('posts/includes/comments.html', {
+            'comments': page,
+            'post_id': post_id,
+            'next_cursor': pages.next_cursor if pages.has_next else None,
+        })
+        cache.set(key, html, settings.COMMENTS_CACHE_TIMEOUT)
+    return html
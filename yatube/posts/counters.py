@@ -0,0 +1,163 @@
+"""Денормализованные счётчики: посты, подписчики и подписки автора
+в UserStats и число комментариев в Post.comment_count.
+
+Сигналы меняют их атомарным UPDATE ... SET x = x + 1, так что страницы
+читают готовые числа без COUNT. recount() чинит расхождения, а заодно
+UserStats.username_key для подсказок.
+
+Общее число постов для номерной пагинации (всего, в группе, у автора)
+живёт в кэше: сигналы правят его на дельту, а по истечении
+POST_COUNT_RECONCILE_INTERVAL значение пересчитывается заново.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+
+def _bump(queryset, field, delta, **extra):
+    if delta < 0:
+        # Разошедшийся счётчик не уводим ниже нуля: его поправит recount.
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta}, **extra)
+
+
+def bump_user(user_id, field, delta):
+    _bump(UserStats.objects.filter(user_id=user_id), field, delta)
+
+
+def bump_post(post_id, delta):
+    # modified сдвигаем вместе со счётчиком: по нему версионируется
+    # закэшированная карточка поста.
+    _bump(Post.objects.filter(pk=post_id), 'comment_count', delta,
+          modified=timezone.now())
+
+
+def stats_for(user):
+    """Счётчики пользователя; недостающую строку досчитывает на месте."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        recount_users([user.pk])
+        return UserStats.objects.get(user=user)
+
+
+def _grouped(queryset, field, user_ids):
+    return dict(
+        queryset.filter(**{f'{field}__in': user_ids}).order_by()
+        .values_list(field).annotate(total=Count('pk'))
+    )
+
+
+def recount_users(user_ids):
+    posts = _grouped(Post.objects, 'author_id', user_ids)
+    followers = _grouped(Follow.objects, 'author_id', user_ids)
+    following = _grouped(Follow.objects, 'user_id', user_ids)
+    usernames = dict(User.objects.filter(pk__in=user_ids)
+                     .values_list('pk', 'username'))
+    stats = [
+        UserStats(
+            user_id=user_id,
+            posts_count=posts.get(user_id, 0),
+            followers_count=followers.get(user_id, 0),
+            following_count=following.get(user_id, 0),
+            username_key=username.lower(),
+        )
+        for user_id, username in usernames.items()
+    ]
+    UserStats.objects.bulk_create(stats, ignore_conflicts=True)
+    UserStats.objects.bulk_update(
+        stats, ['posts_count', 'followers_count', 'following_count',
+                'username_key'])
+
+
+def recount():
+    """Пересчитывает все счётчики по таблицам."""
+    user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+    batch = []
+    for user_id in user_ids.iterator(chunk_size=BATCH_SIZE):
+        batch.append(user_id)
+        if len(batch) == BATCH_SIZE:
+            recount_users(batch)
+            batch = []
+    if batch:
+        recount_users(batch)
+    comments = (
+        Comment.objects.filter(post=OuterRef('pk')).order_by()
+        .values('post').annotate(total=Count('pk')).values('total')
+    )
+    Post.objects.update(comment_count=Coalesce(Subquery(comments), 0))
+
+
+def _post_count_key(group_id=None, author_id=None):
+    if group_id is not None:
+        return f'posts:count:group:{group_id}'
+    if author_id is not None:
+        return f'posts:count:author:{author_id}'
+    return 'posts:count'
+
+
+def _live_post_count(group_id=None, author_id=None):
+    if settings.POST_COUNT_ESTIMATE:
+        # Оценка без обхода таблицы: по индексу первичного ключа
+        # и по счётчику автора.
+        if author_id is not None:
+            return UserStats.objects.filter(user_id=author_id).values_list(
+                'posts_count', flat=True).first() or 0
+        if group_id is None:
+            return Post.objects.aggregate(last=Max('pk'))['last'] or 0
+    posts = Post.objects.order_by()
+    if group_id is not None:
+        posts = posts.filter(group_id=group_id)
+    if author_id is not None:
+        posts = posts.filter(author_id=author_id)
+    return posts.count()
+
+
+def post_count(group_id=None, author_id=None):
+    """Число постов всего, в группе или у автора, из кэша."""
+    key = _post_count_key(group_id, author_id)
+    value = cache.get(key)
+    if value is None:
+        value = _live_post_count(group_id, author_id)
+        cache.add(key, value, settings.POST_COUNT_RECONCILE_INTERVAL)
+    return value
+
+
+def adjust_post_count(delta, group_id=None, author_id=None):
+    try:
+        cache.incr(_post_count_key(group_id, author_id), delta)
+    except ValueError:
+        # Ключа нет: его посчитает ближайший post_count().
+        pass
+
+
+def adjust_post_counts(post, delta, group_id=None):
+    adjust_post_count(delta)
+    adjust_post_count(delta, author_id=post.author_id)
+    if group_id is not None:
+        adjust_post_count(delta, group_id=group_id)
+
+
+def reconcile_post_counts():
+    """Пересчитывает кэшированные числа постов по таблице."""
+    timeout = settings.POST_COUNT_RECONCILE_INTERVAL
+    cache.set(_post_count_key(), _live_post_count(), timeout)
+    for field in ('group_id', 'author_id'):
+        totals = (Post.objects.order_by().exclude(**{field: None})
+                  .values_list(field).annotate(total=Count('pk')))
+        batch = {}
+        for value, total in totals.iterator(chunk_size=BATCH_SIZE):
+            batch[_post_count_key(**{field: value})] = total
+            if len(batch) == BATCH_SIZE:
+                cache.set_many(batch, timeout)
+                batch = {}
+        cache.set_many(batch, timeout)
@@ -0,0 +1,66 @@
+"""Валидаторы для условных GET-запросов к лентам и странице поста.
+
+ETag собирается из номеров поколений (см. versions) и считается до
+выборки постов и рендеринга: если у клиента та же версия, view отвечает
+304, не трогая ленту. Страница зависит и от читателя (шапка, кнопка
+подписки), поэтому его id входит в ETag, а ответы идут с Vary: Cookie.
+ETag слабый: CSRF-токен в формах меняется от рендера к рендеру.
+"""
+import hashlib
+from datetime import date
+
+from .models import Group, Post, User
+from . import versions
+
+
+def _etag(request, *parts):
+    reader = request.user.pk if request.user.is_authenticated else 'anon'
+    # Год выводится в подвале, запрос задаёт страницу ленты.
+    raw = ':'.join(str(part) for part in (
+        *parts, reader, date.today().year, request.GET.urlencode()))
+    return 'W/"%s"' % hashlib.md5(raw.encode()).hexdigest()
+
+
+def _reader_id(request):
+    return request.user.pk if request.user.is_authenticated else None
+
+
+def index_etag(request):
+    return _etag(request, versions.index_version())
+
+
+def group_etag(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    if group_id is None:
+        # Без ETag view отработает как обычно и вернёт 404.
+        return None
+    return _etag(request, versions.group_version(group_id))
+
+
+def profile_etag(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    if author_id is None:
+        return None
+    return _etag(request, versions.profile_version(author_id),
+                 versions.relations_version(author_id, _reader_id(request)))
+
+
+def follow_etag(request):
+    return _etag(request, versions.follow_version(request.user.pk))
+
+
+def post_etag(request, post_id):
+    state = Post.objects.filter(pk=post_id).values_list(
+        'modified', 'author_id').first()
+    if state is None:
+        return None
+    modified, author_id = state
+    # modified сдвигается при правке поста и при каждом новом
+    # комментарии, поколение комментариев - и при их правке, поколения
+    # автора - при его новых постах и смене имён. Last-Modified страница
+    # не отдаёт: по одной дате поста эти изменения не видны.
+    return _etag(request, post_id, modified.timestamp(),
+                 versions.profile_version(author_id),
+                 versions.comments_version(post_id))
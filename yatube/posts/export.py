@@ -0,0 +1,95 @@
+"""Потоковая выгрузка постов, комментариев и подписок в NDJSON.
+
+Каждая строка - объект в формате dumpdata ({"model", "pk", "fields"}),
+так что выгрузку без изменений читает import_posts. Таблицы обходятся
+курсором по первичному ключу пачками по CHUNK_SIZE строк: в памяти
+только текущая пачка, и каждая пачка - один запрос по индексу, без
+OFFSET. Сжатие gzip идёт тем же потоком.
+"""
+import json
+import logging
+import time
+import zlib
+
+from .models import Comment, Follow, Post
+
+logger = logging.getLogger(__name__)
+
+MODELS = (Post, Comment, Follow)
+CHUNK_SIZE = 2000
+# wbits=31: zlib пишет заголовок и хвост gzip.
+GZIP_WBITS = 31
+
+
+def _columns(model):
+    """Пары (attname, имя в fields) для всех полей, кроме pk."""
+    return [(field.attname, field.name)
+            for field in model._meta.concrete_fields
+            if not field.primary_key]
+
+
+def rows(model, chunk_size=CHUNK_SIZE):
+    """Строки таблицы словарями values() в порядке pk."""
+    columns = ['pk', *(attname for attname, _ in _columns(model))]
+    queryset = model.objects.order_by('pk').values(*columns)
+    last = None
+    while True:
+        chunk = queryset if last is None else queryset.filter(pk__gt=last)
+        chunk = list(chunk[:chunk_size])
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        last = chunk[-1]['pk']
+
+
+def _default(value):
+    # Даты целиком, с микросекундами: DjangoJSONEncoder их обрезает.
+    return value.isoformat()
+
+
+class Export:
+    """Итератор строк NDJSON по MODELS; считает строки и время."""
+
+    def __init__(self, models=MODELS, chunk_size=CHUNK_SIZE):
+        self.models = models
+        self.chunk_size = chunk_size
+        self.count = 0
+        self.started = self.finished = None
+
+    def __iter__(self):
+        self.started = time.monotonic()
+        for model in self.models:
+            label = model._meta.label_lower
+            columns = _columns(model)
+            for row in rows(model, self.chunk_size):
+                self.count += 1
+                yield json.dumps({
+                    'model': label,
+                    'pk': row['pk'],
+                    'fields': {name: row[attname]
+                               for attname, name in columns},
+                }, ensure_ascii=False, default=_default) + '\n'
+        self.finished = time.monotonic()
+        logger.info('Выгрузка: %s', self.summary())
+
+    @property
+    def rate(self):
+        seconds = (self.finished or time.monotonic()) - self.started
+        return self.count / max(seconds, 1e-6)
+
+    def summary(self):
+        return f'{self.count} строк, {self.rate:.0f} строк/с'
+
+
+def encoded(lines, compress=False):
+    """Байты выгрузки, по желанию сжатые gzip на лету."""
+    if not compress:
+        for line in lines:
+            yield line.encode()
+        return
+    compressor = zlib.compressobj(wbits=GZIP_WBITS)
+    for line in lines:
+        data = compressor.compress(line.encode())
+        if data:
+            yield data
+    yield compressor.flush()
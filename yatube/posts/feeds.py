@@ -0,0 +1,265 @@
+"""Лента подписок: гибрид push и pull.
+
+Посты обычных авторов раскладываются в FeedItem всем подписчикам при
+публикации (push), и follow_index читает ленту одним диапазоном по индексу
+(user, pub_date). Авторы, у которых подписчиков не меньше
+FEED_PULL_THRESHOLD, при публикации пропускаются: их свежие посты
+подмешиваются при чтении k-way слиянием с готовой лентой (pull).
+"""
+import heapq
+import math
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Exists, OuterRef
+
+from core import queries
+from .models import FeedItem, Follow, Post, UserStats
+from .paginators import CursorPaginator
+
+PULLED_AUTHORS_KEY = 'feed:pulled_authors'
+METRICS_KEYS = ('feed:reads', 'feed:pulled', 'feed:truncated')
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _insert(items):
+    # Пачек не больше, чем подписчиков у push-автора (или постов
+    # у автора при backfill), делённых на FEED_FANOUT_BATCH_SIZE.
+    with queries.expected_repeats():
+        for batch in _batches(items, settings.FEED_FANOUT_BATCH_SIZE):
+            FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out_queries():
+    """Сколько INSERT в худшем случае делает fan_out: у push-автора
+    меньше FEED_PULL_THRESHOLD подписчиков, а bulk_create делит пачку
+    по лимиту параметров базы."""
+    fields = [field for field in FeedItem._meta.concrete_fields
+              if not field.primary_key]
+    rows = connection.ops.bulk_batch_size(fields, [None])
+    batches = math.ceil(settings.FEED_PULL_THRESHOLD
+                        / settings.FEED_FANOUT_BATCH_SIZE)
+    return batches * math.ceil(settings.FEED_FANOUT_BATCH_SIZE / rows)
+
+
+def _pulled_authors_key():
+    return f'{PULLED_AUTHORS_KEY}:{settings.FEED_PULL_THRESHOLD}'
+
+
+def pulled_authors():
+    """id авторов, чьи посты подмешиваются в ленту при чтении."""
+    threshold = settings.FEED_PULL_THRESHOLD
+    key = _pulled_authors_key()
+    author_ids = cache.get(key)
+    if author_ids is None:
+        author_ids = set(
+            UserStats.objects.filter(followers_count__gte=threshold)
+            .values_list('user_id', flat=True)
+        )
+        cache.set(key, author_ids, settings.FEED_PULLED_AUTHORS_TIMEOUT)
+    return author_ids
+
+
+def fan_out(post):
+    """Раскладывает пост в ленты всех подписчиков автора."""
+    if post.author_id in pulled_authors():
+        return
+    followers = (
+        Follow.objects.filter(author_id=post.author_id)
+        .order_by().values_list('user_id', flat=True)
+        .iterator(chunk_size=settings.FEED_FANOUT_BATCH_SIZE)
+    )
+    _insert(
+        FeedItem(user_id=user_id, post_id=post.pk,
+                 author_id=post.author_id, pub_date=post.pub_date)
+        for user_id in followers
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    if author_id in pulled_authors():
+        return
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .order_by().values_list('pk', 'pub_date')
+        .iterator(chunk_size=settings.FEED_FANOUT_BATCH_SIZE)
+    )
+    _insert(
+        FeedItem(user_id=user_id, post_id=post_id,
+                 author_id=author_id, pub_date=pub_date)
+        for post_id, pub_date in posts
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты подписчика посты автора после отписки."""
+    FeedItem.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(user_ids=None):
+    """Пересобирает ленты с нуля по таблице Follow одним
+    INSERT ... SELECT, без построчной выборки в Python."""
+    if user_ids is None:
+        # Число подписчиков могло измениться сразу у всех (загрузка
+        # дампа): pull-авторов определяем заново.
+        cache.delete(_pulled_authors_key())
+    items = FeedItem.objects.all()
+    follows = Follow.objects.exclude(author_id__in=pulled_authors())
+    if user_ids is not None:
+        items = items.filter(user_id__in=user_ids)
+        follows = follows.filter(user_id__in=user_ids)
+    items.delete()
+    _insert_select(follows.filter(author__posts__isnull=False))
+
+
+def _insert_select(follows):
+    """Кладёт посты авторов из follows в ленты подписчиков одним
+    INSERT ... SELECT."""
+    rows = follows.order_by().values_list(
+        'user_id', 'author__posts__id', 'author_id', 'author__posts__pub_date')
+    sql, params = rows.query.sql_with_params()
+    table = FeedItem._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (user_id, post_id, author_id, pub_date) '
+            + sql, params)
+
+
+def follower_lost(author_id):
+    """Вызывается после отписки. Автор, опустившийся ниже
+    FEED_PULL_THRESHOLD, возвращается на push: посты, написанные им
+    на pull-пути, раскладываются подписчикам, иначе они пропали бы
+    из лент, как только автор перестанет подмешиваться при чтении."""
+    followers = UserStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True).first()
+    if followers != settings.FEED_PULL_THRESHOLD - 1:
+        return
+    # Без сброса fan_out ещё FEED_PULLED_AUTHORS_TIMEOUT пропускал бы
+    # его новые посты.
+    cache.delete(_pulled_authors_key())
+    fed = FeedItem.objects.filter(user_id=OuterRef('user_id'),
+                                  post_id=OuterRef('author__posts__id'))
+    _insert_select(
+        Follow.objects.filter(author_id=author_id,
+                              author__posts__isnull=False)
+        .annotate(fed=Exists(fed)).filter(fed=False))
+
+
+def feed_for(user):
+    """Лента пользователя в порядке (pub_date, post_id) по убыванию."""
+    return FeedItem.objects.filter(user=user).select_related(
+        'post__author', 'post__group')
+
+
+def _count(key, delta=1):
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        pass
+
+
+def metrics():
+    """Сколько авторов сейчас на каждом пути и статистика чтений."""
+    threshold = settings.FEED_PULL_THRESHOLD
+    stats = UserStats.objects.filter(followers_count__gt=0)
+    values = cache.get_many(METRICS_KEYS)
+    return {
+        'push_authors': stats.filter(followers_count__lt=threshold).count(),
+        'pull_authors': stats.filter(followers_count__gte=threshold).count(),
+        'reads': values.get('feed:reads', 0),
+        'pulled_total': values.get('feed:pulled', 0),
+        'truncated_reads': values.get('feed:truncated', 0),
+    }
+
+
+class HybridFeedPaginator(CursorPaginator):
+    """Курсорный пагинатор по ленте пользователя, сливающий FeedItem
+    с постами pull-авторов.
+
+    На запрос уходит не больше FEED_MAX_PULLED_AUTHORS + 1 выборок по
+    per_page + 1 строк; лишние pull-авторы (самые давние подписки)
+    в ленту не попадают и учитываются в метрике truncated.
+    """
+
+    def __init__(self, user, per_page):
+        super().__init__(feed_for(user), per_page,
+                         ordering=('-pub_date', '-post_id'))
+        self.user = user
+        limit = settings.FEED_MAX_PULLED_AUTHORS
+        author_ids = list(
+            Follow.objects.filter(user=user, author_id__in=pulled_authors())
+            .order_by('-pk').values_list('author_id', flat=True)[:limit + 1]
+        )
+        self.truncated = len(author_ids) > limit
+        self.author_ids = author_ids[:limit]
+        _count('feed:reads')
+        _count('feed:pulled', len(self.author_ids))
+        if self.truncated:
+            _count('feed:truncated')
+
+    def _pull(self, author_id, position, backwards, limit):
+        posts = Post.objects.filter(author_id=author_id)
+        if position is not None:
+            posts = posts.filter(
+                self._after(position, backwards, ('pub_date', 'pk')))
+        ordering = ('pub_date', 'pk') if backwards else ('-pub_date', '-pk')
+        posts = posts.select_related('author', 'group').order_by(*ordering)
+        return [
+            FeedItem(user=self.user, post=post, author_id=post.author_id,
+                     pub_date=post.pub_date)
+            for post in posts[:limit]
+        ]
+
+    def get_page(self, number):
+        """Номерная страница для старых ссылок ?page=N.
+
+        Лента сливается с начала, так что страница N стоит N * per_page
+        строк из каждого источника, зато без join и сортировки. Поэтому
+        номер не больше FEED_MAX_PAGE, а на последней разрешённой
+        странице ссылки на следующую нет. Общее число постов не
+        известно: count равен числу прочитанных строк, и следующая
+        страница видна, только если за текущей есть пост.
+        """
+        try:
+            number = max(1, int(number))
+        except (TypeError, ValueError):
+            number = 1
+        number = min(number, settings.FEED_MAX_PAGE)
+        self.is_keyset = False
+        extra = 1 if number < settings.FEED_MAX_PAGE else 0
+        rows = self.fetch(None, False, number * self.per_page + extra)
+        self.count = len(rows)
+        number = min(number, self.num_pages)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(rows[bottom:bottom + self.per_page],
+                              number, self)
+
+    def fetch(self, position, backwards, limit):
+        streams = [super().fetch(position, backwards, limit)]
+        # По выборке на pull-автора, но не больше FEED_MAX_PULLED_AUTHORS.
+        with queries.expected_repeats():
+            streams += [self._pull(author_id, position, backwards, limit)
+                        for author_id in self.author_ids]
+        merged, seen = [], set()
+        for item in heapq.merge(*streams, key=self.position,
+                                reverse=self.descending != backwards):
+            # Пост мог попасть в ленту и push-ем, пока автор был обычным.
+            if item.post_id in seen:
+                continue
+            seen.add(item.post_id)
+            merged.append(item)
+            if len(merged) == limit:
+                break
+        return merged
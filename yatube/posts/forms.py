@@ -1,11 +1,25 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+
+from . import images
 from .models import Post, Comment
+from .widgets import Autocomplete
 
 
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post
         fields = ("text", "group", "image")
+        widgets = {
+            'group': Autocomplete('groups'),
+        }
+
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # На правке без новой загрузки здесь уже сохранённый файл.
+        if isinstance(image, UploadedFile):
+            image = images.process(image)
+        return image
 
 
 class CommentForm(forms.ModelForm):
@@ -0,0 +1,112 @@
+"""Проверка и перезапись загружаемых картинок постов.
+
+Файл приходит во временный файл на диске (FILE_UPLOAD_HANDLERS), а не
+в память. Размеры читаются из заголовка, до декодирования пикселей,
+и слишком большие картинки отклоняются сразу. Остальные
+перекодируются: если сторона больше IMAGE_MAX_SIDE, JPEG декодируется
+сразу в уменьшенном масштабе (draft), так что полноразмерный JPEG
+в памяти не оказывается. Другие форматы декодируются целиком, поэтому
+для них лимит ниже: IMAGE_MAX_DECODED_PIXELS вместо IMAGE_MAX_PIXELS.
+При перезаписи теряются EXIF и прочие метаданные (в том числе
+геометка), а ориентация из EXIF применяется к пикселям. Анимации
+(GIF, WebP, APNG) перезаписываются покадрово с теми же ограничениями.
+"""
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps, ImageSequence
+
+JPEG_QUALITY = 90
+ORIENTATION = 0x0112
+# draft декодирует JPEG сразу в масштабе 1/2, 1/4 или 1/8, но не меньше
+# цели: в памяти не больше учетверённой итоговой картинки.
+REDUCING_GAP = 1.0
+# Длительность кадра анимации, если файл её не указал, мс.
+DEFAULT_DURATION = 100
+
+
+def _check_size(upload):
+    if upload.size > settings.IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s.',
+            params={'limit': filesizeformat(settings.IMAGE_MAX_UPLOAD_SIZE)},
+            code='file_too_large')
+
+
+def _check_pixels(image):
+    # Image.open читает только заголовок: size известен до декодирования.
+    width, height = image.size
+    if image.format == 'JPEG':
+        limit = settings.IMAGE_MAX_PIXELS
+    else:
+        limit = settings.IMAGE_MAX_DECODED_PIXELS
+    if width * height > limit:
+        raise ValidationError(
+            'Картинка %(width)s×%(height)s слишком большая.',
+            params={'width': width, 'height': height},
+            code='too_many_pixels')
+    # Кадры анимации держатся в памяти до записи: лимит на все сразу.
+    frames = getattr(image, 'n_frames', 1)
+    if frames * width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Анимация из %(frames)s кадров %(width)s×%(height)s '
+            'слишком большая.',
+            params={'frames': frames, 'width': width, 'height': height},
+            code='too_many_pixels')
+
+
+def _save_options(image, image_format):
+    options = {}
+    # Цветовой профиль не метаданные: без него поплывут цвета.
+    if image.info.get('icc_profile'):
+        options['icc_profile'] = image.info['icc_profile']
+    if image_format in ('JPEG', 'WEBP'):
+        options['quality'] = JPEG_QUALITY
+    return options
+
+
+def _save_still(image, image_format, output):
+    side = settings.IMAGE_MAX_SIDE
+    image.thumbnail((side, side), reducing_gap=REDUCING_GAP)
+    if image.getexif().get(ORIENTATION, 1) != 1:
+        image = ImageOps.exif_transpose(image)
+    image.save(output, image_format, **_save_options(image, image_format))
+
+
+def _save_animation(image, image_format, output):
+    """Пересобирает анимацию (GIF, WebP, APNG) покадрово: в памяти
+    полноразмерным бывает только текущий кадр."""
+    side = settings.IMAGE_MAX_SIDE
+    frames, durations = [], []
+    for frame in ImageSequence.Iterator(image):
+        durations.append(frame.info.get('duration', DEFAULT_DURATION))
+        frame = frame.convert('RGBA')
+        frame.thumbnail((side, side), reducing_gap=REDUCING_GAP)
+        frames.append(frame)
+    frames[0].save(output, image_format, save_all=True,
+                   append_images=frames[1:], duration=durations,
+                   loop=image.info.get('loop', 0),
+                   **_save_options(image, image_format))
+
+
+def process(upload):
+    """Проверяет загруженную картинку и возвращает её перезаписанную
+    копию без метаданных, не больше IMAGE_MAX_SIDE по стороне."""
+    _check_size(upload)
+    upload.seek(0)
+    with Image.open(upload) as image:
+        _check_pixels(image)
+        image_format = image.format
+        # Маленький результат остаётся в памяти, большой уходит на диск.
+        output = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+        if getattr(image, 'is_animated', False):
+            _save_animation(image, image_format, output)
+        else:
+            _save_still(image, image_format, output)
+    size = output.tell()
+    output.seek(0)
+    return UploadedFile(output, upload.name, upload.content_type, size)
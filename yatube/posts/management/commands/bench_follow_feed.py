@@ -0,0 +1,74 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from posts import feeds
+from posts.models import Post
+from posts.paginators import CursorPaginator
+
+User = get_user_model()
+
+
+def timed(func, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает чтение ленты подписок через join Follow x Post '
+            'и через материализованную ленту.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5,
+                            help='Сколько самых подписанных читателей взять.')
+        parser.add_argument('--pages', type=int, default=20,
+                            help='Глубина обхода ленты в страницах.')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, users, pages, repeat, **options):
+        readers = (User.objects.annotate(follows=Count('follower'))
+                   .filter(follows__gt=0).order_by('-follows')[:users])
+        per_page = settings.PAGINATION_NUM
+        for reader in readers:
+            def join_first():
+                list(Post.objects.select_related('author', 'group')
+                     .filter(author__following__user=reader)[:per_page])
+
+            def join_deep():
+                offset = (pages - 1) * per_page
+                list(Post.objects.select_related('author', 'group')
+                     .filter(author__following__user=reader)
+                     [offset:offset + per_page])
+
+            def feed_walk():
+                cursor = None
+                for _ in range(pages):
+                    paginator = CursorPaginator(
+                        feeds.feed_for(reader), per_page,
+                        ordering=('-pub_date', '-post_id'))
+                    paginator.get_cursor_page(cursor)
+                    if not paginator.has_next:
+                        break
+                    cursor = paginator.next_cursor
+
+            def feed_first():
+                CursorPaginator(feeds.feed_for(reader), per_page,
+                                ordering=('-pub_date', '-post_id')
+                                ).get_cursor_page()
+
+            self.stdout.write(
+                f'{reader.username} ({reader.follows} подписок): '
+                f'join, стр. 1 {timed(join_first, repeat):.2f} мс; '
+                f'join, стр. {pages} {timed(join_deep, repeat):.2f} мс; '
+                f'лента, стр. 1 {timed(feed_first, repeat):.2f} мс; '
+                f'лента, {pages} стр. подряд '
+                f'{timed(feed_walk, repeat):.2f} мс'
+            )
@@ -0,0 +1,85 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import search
+from posts.models import Post
+
+User = get_user_model()
+
+LETTERS = 'абвгдежзиклмнопрстуфхцчшэюя'
+VOCABULARY = 20000
+
+
+def vocabulary():
+    rng = random.Random(0)
+    return [''.join(rng.choices(LETTERS, k=rng.randint(4, 10)))
+            for _ in range(VOCABULARY)]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает задержку поиска по FTS5 и LIKE. С --seed временно '
+            'добавляет посты и откатывает их после замера.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Сколько постов добавить на время замера.')
+        parser.add_argument('--runs', type=int, default=50)
+
+    def handle(self, *args, seed, runs, **options):
+        if not search.available():
+            raise CommandError('FTS5 есть только в SQLite.')
+        try:
+            with transaction.atomic():
+                if seed:
+                    self.seed(seed)
+                self.measure(runs)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, total):
+        author = User.objects.create(username='bench_search_author')
+        rng = random.Random(0)
+        words = vocabulary()
+        # Частоты слов по Ципфу, как в живом тексте.
+        weights = [1 / rank for rank in range(1, len(words) + 1)]
+        Post.objects.bulk_create(
+            Post(author=author, text=' '.join(
+                rng.choices(words, weights, k=rng.randint(5, 40))))
+            for _ in range(total))
+
+    def timed(self, func, queries):
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            func(query)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        return (statistics.median(timings),
+                timings[int(len(timings) * 0.95) - 1])
+
+    def measure(self, runs):
+        def fts(word):
+            paginator = search.SearchPaginator(search.match_query(word), 10)
+            list(paginator.get_cursor_page())
+
+        def like(word):
+            list(Post.objects.filter(text__icontains=word)
+                 .order_by('-pub_date')[:10])
+
+        rng = random.Random(1)
+        queries = rng.sample(vocabulary(), runs)
+        self.stdout.write(f'Постов: {Post.objects.count()}')
+        for name, func in (('fts5', fts), ('like', like)):
+            median, p95 = self.timed(func, queries)
+            self.stdout.write(
+                f'{name}: медиана {median:.2f} мс, p95 {p95:.2f} мс')
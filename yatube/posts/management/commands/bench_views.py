@@ -0,0 +1,50 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Замеряет страницы posts.views через тестовый клиент: '
+            'p50/p95/p99, SQL-запросы, попадания в кэш и размер ответа. '
+            'Пишущие сценарии откатываются; кэши на время замера - '
+            'отдельные временные, кэш сайта не трогается.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--cold', action='store_true',
+                            help='Очищать кэш перед каждым запросом.')
+        parser.add_argument('--only', nargs='+', metavar='VIEW',
+                            help='Замерить только эти сценарии.')
+        parser.add_argument('--output', help='Сохранить результаты в JSON.')
+        parser.add_argument('--compare', metavar='BASELINE',
+                            help='JSON прошлого прогона для сравнения.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Допустимый рост p95, доля.')
+
+    def handle(self, *args, runs, warmup, cold, only, output, compare,
+               threshold, **options):
+        try:
+            report = benchmarks.run(runs, warmup, cold, only)
+        except benchmarks.NoData as error:
+            raise CommandError(error)
+        for name, result in report['views'].items():
+            self.stdout.write(
+                f'{name}: p50 {result["p50_ms"]:.1f} мс, '
+                f'p95 {result["p95_ms"]:.1f} мс, '
+                f'p99 {result["p99_ms"]:.1f} мс, '
+                f'запросов {result["queries"]}, '
+                f'кэш {result["cache_hits"]:g}/{result["cache_misses"]:g}, '
+                f'{result["bytes"]} байт, HTTP {result["status"]}')
+        if output:
+            with open(output, 'w', encoding='utf-8') as stream:
+                json.dump(report, stream, ensure_ascii=False, indent=2)
+        if compare:
+            with open(compare, encoding='utf-8') as stream:
+                baseline = json.load(stream)
+            found = benchmarks.regressions(baseline, report, threshold)
+            if found:
+                raise CommandError('Регрессии:\n' + '\n'.join(found))
+            self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
@@ -0,0 +1,36 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = ('Выгружает посты, комментарии и подписки в NDJSON потоком, '
+            'курсором по первичному ключу; выгрузку читает import_posts.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-',
+                            help='Файл выгрузки; «-» - стандартный вывод.')
+        parser.add_argument('--gzip', action='store_true',
+                            help='Сжать выгрузку gzip.')
+        parser.add_argument('--chunk-size', type=int,
+                            default=export.CHUNK_SIZE,
+                            help='Сколько строк читать одним запросом.')
+
+    def handle(self, *args, path, gzip, chunk_size, **options):
+        lines = export.Export(chunk_size=chunk_size)
+        try:
+            if path == '-':
+                self.write(sys.stdout.buffer, lines, gzip)
+            else:
+                with open(path, 'wb') as stream:
+                    self.write(stream, lines, gzip)
+        except OSError as error:
+            raise CommandError(f'Не удалось записать {path}: {error}')
+        self.stderr.write(f'Выгружено: {lines.summary()}')
+
+    def write(self, stream, lines, compress):
+        for data in export.encoded(lines, compress):
+            stream.write(data)
+        stream.flush()
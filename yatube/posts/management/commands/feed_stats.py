@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import feeds
+
+
+class Command(BaseCommand):
+    help = 'Показывает, сколько авторов лента обслуживает push и pull.'
+
+    def handle(self, *args, **options):
+        stats = feeds.metrics()
+        self.stdout.write(
+            f'Порог pull: {settings.FEED_PULL_THRESHOLD} подписчиков\n'
+            f'Авторов на push: {stats["push_authors"]}\n'
+            f'Авторов на pull: {stats["pull_authors"]}\n'
+            f'Чтений ленты: {stats["reads"]}\n'
+            f'Подмешано pull-авторов за все чтения: '
+            f'{stats["pulled_total"]}\n'
+            f'Чтений с обрезанным списком pull-авторов: '
+            f'{stats["truncated_reads"]}'
+        )
@@ -0,0 +1,49 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from core.storage import is_content_name
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Переносит картинки постов из плоского каталога posts/ '
+            'в хранилище по содержимому, объединяя одинаковые файлы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать, что будет перенесено.')
+
+    def handle(self, *args, dry_run=False, **options):
+        storage = Post._meta.get_field('image').storage
+        names = (Post.objects.exclude(image='').order_by()
+                 .values_list('image').annotate(total=Count('pk')))
+        moved = missing = 0
+        blobs = set()
+        # Список целиком: по ходу переноса эти же строки обновляются.
+        for name, total in list(names):
+            if is_content_name(name):
+                continue
+            if not storage.exists(name):
+                missing += 1
+                self.stderr.write(f'Нет файла: {name}')
+                continue
+            if dry_run:
+                moved += 1
+                continue
+            new_name = storage.adopt(name, total)
+            # modified сдвигаем, чтобы карточки постов перерисовались
+            # с новыми адресами картинок.
+            Post.objects.filter(image=name).update(
+                image=new_name, modified=timezone.now())
+            os.remove(storage.path(name))
+            blobs.add(new_name)
+            moved += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено файлов: {moved}, различных: {len(blobs)}, '
+            f'не найдено: {missing}'))
+        if moved and not dry_run:
+            self.stdout.write('Миниатюры для новых имён построит '
+                              'warm_thumbnails.')
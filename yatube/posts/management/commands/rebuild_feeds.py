@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import feeds
+from posts.models import FeedItem
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок по таблице Follow.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='id пользователя; можно указать несколько раз.')
+
+    def handle(self, *args, user_ids=None, **options):
+        feeds.rebuild(user_ids)
+        items = FeedItem.objects.all()
+        if user_ids:
+            items = items.filter(user_id__in=user_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f'Лент пересобрано, строк в ленте: {items.count()}'))
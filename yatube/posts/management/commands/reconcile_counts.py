@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает закэшированные числа постов для пагинации: '
+            'всего, по группам и по авторам.')
+
+    def handle(self, *args, **options):
+        counters.reconcile_post_counts()
+        self.stdout.write(self.style.SUCCESS('Числа постов пересчитаны'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики постов, подписчиков, подписок '
+            'и комментариев по таблицам.')
+
+    def handle(self, *args, **options):
+        counters.recount()
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
@@ -0,0 +1,263 @@
+import bisect
+import datetime
+import itertools
+import random
+import time
+from array import array
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from faker import Faker
+
+from posts import search
+from posts.bulk import dates_from_dump, rebuild_derived
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Имена и slug сгенерированных строк: по этому префиксу команда находит
+# свои данные, диапазоном по уникальному индексу.
+PREFIX = 'seed-'
+PREFIX_END = 'seed.'
+# Строк на один bulk_create. Каждый вызов - отдельная транзакция, так
+# что прерванная команда теряет не больше одной пачки.
+BLOCK = 5000
+END = datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc)
+# Доля пользователей, которые вообще пишут посты; остальные только
+# читают и подписываются.
+POSTERS_SHARE = 0.4
+# Показатели степенных законов: частота постов автора и число его
+# подписчиков убывают как 1 / ранг ** показатель. Ранги у двух законов
+# независимы: при совпадающих ранжированиях самые плодовитые авторы
+# были бы и самыми читаемыми, и лента подписок разрослась бы до
+# миллиарда строк даже у сотни тысяч пользователей.
+POSTS_EXPONENT = 1.0
+POPULARITY_EXPONENT = 1.0
+COMMENTERS_EXPONENT = 0.8
+GROUPS_EXPONENT = 1.0
+TAGS_EXPONENT = 1.0
+MAX_FOLLOWS = 5000
+GROUP_SHARE = 0.5
+TAG_SHARE = 0.2
+# Средняя задержка комментария после поста, секунды.
+COMMENT_DELAY = 6 * 3600
+GOLDEN = 0.6180339887498949
+
+
+def zipf_weights(count, exponent):
+    """Накопленные веса 1 / ранг ** exponent для random.choices."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def pick(rng, population, cum_weights):
+    return population[bisect.bisect(cum_weights,
+                                    rng.random() * cum_weights[-1])]
+
+
+class Command(BaseCommand):
+    help = ('Генерирует детерминированный набор данных: пользователей, '
+            'группы, посты, комментарии и подписки со степенными '
+            'распределениями (немного популярных авторов, много читателей). '
+            'Повторный запуск с теми же параметрами продолжает прерванную '
+            'генерацию и пересобирает производные данные.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--groups', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--comments', type=int, default=500_000)
+        parser.add_argument('--follows', type=int, default=10,
+                            help='Среднее число подписок пользователя.')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней до 2022-01-01 '
+                                 'распределить посты.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.start = END - datetime.timedelta(days=options['days'])
+        self.prepare(options['seed'], options['users'], options['groups'])
+        # Триггеры поиска сработали бы на каждую строку: индекс дешевле
+        # собрать одним проходом в конце.
+        search.drop_triggers()
+        try:
+            with dates_from_dump([User, Post, Comment]):
+                self.phase('группы', self.groups)
+                self.phase('пользователи', self.users)
+                self.phase('посты', self.posts)
+                self.phase('подписки', self.follows)
+                self.phase('комментарии', self.comments)
+            timings = rebuild_derived()
+        finally:
+            # Прерванный запуск не оставляет сайт без триггеров: посты,
+            # созданные до повторного запуска, попадут в поиск. После
+            # rebuild_derived() триггеры на месте, и вызов ничего не делает.
+            search.install()
+        self.stdout.write('Производные данные: ' + ', '.join(
+            f'{name} {spent:.1f} с' for name, spent in timings))
+
+    def prepare(self, seed, users, groups):
+        """Всё, что не зависит от номера пачки: словари Faker,
+        распределения по рангам и перестановки пользователей."""
+        self.seed = seed
+        fake = Faker('ru_RU')
+        fake.seed_instance(seed)
+        self.sentences = [fake.sentence(nb_words=10) for _ in range(2000)]
+        self.first_names = [fake.first_name() for _ in range(500)]
+        self.last_names = [fake.last_name() for _ in range(500)]
+        self.words = sorted({fake.word() for _ in range(1500)})
+        self.tags = self.words[:500]
+        rng = self.rng('graph')
+        posters = rng.sample(range(users), int(users * POSTERS_SHARE) or 1)
+        self.posters = posters
+        self.popular = rng.sample(posters, len(posters))
+        self.commenters = rng.sample(range(users), users)
+        self.posts_weights = zipf_weights(len(posters), POSTS_EXPONENT)
+        self.popular_weights = zipf_weights(len(posters),
+                                            POPULARITY_EXPONENT)
+        self.commenters_weights = zipf_weights(users, COMMENTERS_EXPONENT)
+        self.groups_weights = zipf_weights(groups, GROUPS_EXPONENT)
+        self.tags_weights = zipf_weights(len(self.tags), TAGS_EXPONENT)
+
+    def rng(self, *key):
+        # Строковое зерно хэшируется одинаково в любом процессе.
+        return random.Random(':'.join(map(str, (self.seed, *key))))
+
+    def phase(self, name, generate):
+        started = time.monotonic()
+        created = generate()
+        seconds = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(f'{name}: добавлено {created} '
+                          f'({created / seconds:.0f} строк/с)')
+
+    def blocks(self, kind, total, done):
+        """(rng, номера строк) для пачек, которых ещё нет в базе."""
+        for block in range(done // BLOCK, -(-total // BLOCK)):
+            numbers = range(max(block * BLOCK, done),
+                            min((block + 1) * BLOCK, total))
+            rng = self.rng(kind, block)
+            # Пропущенные строки пачки тоже разыгрываем: иначе
+            # продолжение дало бы другие данные, чем запуск с нуля.
+            for number in range(block * BLOCK, numbers.start):
+                getattr(self, f'{kind}_row')(rng, number)
+            yield rng, numbers
+
+    def insert(self, model, kind, total, done):
+        created = 0
+        row = getattr(self, f'{kind}_row')
+        for rng, numbers in self.blocks(kind, total, done):
+            # bulk_create выполняется в одной транзакции.
+            model.objects.bulk_create([row(rng, number)
+                                       for number in numbers])
+            created += len(numbers)
+            if self.options['verbosity'] >= 2:
+                self.stdout.write(f'{model._meta.label}: {numbers.stop}')
+        return created
+
+    def seeded(self, queryset, field):
+        return queryset.filter(**{f'{field}__gte': PREFIX,
+                                  f'{field}__lt': PREFIX_END})
+
+    def ids(self, queryset):
+        return array('q', queryset.order_by('pk').values_list(
+            'pk', flat=True).iterator())
+
+    def groups(self):
+        done = self.seeded(Group.objects, 'slug').count()
+        created = self.insert(Group, 'groups', self.options['groups'], done)
+        self.group_ids = self.ids(self.seeded(Group.objects, 'slug'))
+        return created
+
+    def groups_row(self, rng, number):
+        return Group(slug=f'{PREFIX}{number}',
+                     title=f'{rng.choice(self.words).capitalize()} {number}',
+                     description=rng.choice(self.sentences))
+
+    def users(self):
+        done = self.seeded(User.objects, 'username').count()
+        created = self.insert(User, 'users', self.options['users'], done)
+        self.user_ids = self.ids(self.seeded(User.objects, 'username'))
+        return created
+
+    def users_row(self, rng, number):
+        return User(username=f'{PREFIX}{number}', password='!',
+                    first_name=rng.choice(self.first_names),
+                    last_name=rng.choice(self.last_names),
+                    date_joined=self.start - datetime.timedelta(
+                        days=rng.uniform(0, 3 * 365)))
+
+    def pub_date(self, number):
+        # Даты растут вместе с номером поста, с неравным шагом.
+        total = self.options['posts']
+        offset = (number + (number * GOLDEN) % 1) / total
+        return self.start + (END - self.start) * offset
+
+    def posts(self):
+        authors = self.seeded(Post.objects, 'author__username')
+        created = self.insert(Post, 'posts', self.options['posts'],
+                              authors.count())
+        self.post_ids = self.ids(authors)
+        return created
+
+    def posts_row(self, rng, number):
+        text = ' '.join(rng.choices(self.sentences, k=rng.randint(1, 4)))
+        if rng.random() < TAG_SHARE:
+            text += ' #' + pick(rng, self.tags, self.tags_weights)
+        group_id = None
+        if self.group_ids and rng.random() < GROUP_SHARE:
+            group_id = pick(rng, self.group_ids, self.groups_weights)
+        pub_date = self.pub_date(number)
+        return Post(text=text, group_id=group_id, pub_date=pub_date,
+                    modified=pub_date, author_id=self.user_ids[
+                        pick(rng, self.posters, self.posts_weights)])
+
+    def follows(self):
+        # Подписки идут пачками по подписчикам: готовы все пачки до той,
+        # где подписчик с наибольшим id.
+        last = self.seeded(Follow.objects, 'user__username').aggregate(
+            last=Max('user_id'))['last']
+        done = 0
+        if last is not None:
+            done = (bisect.bisect(self.user_ids, last) - 1) // BLOCK + 1
+        created = 0
+        for block in range(done, -(-len(self.user_ids) // BLOCK)):
+            rng = self.rng('follows', block)
+            edges = []
+            for number in range(block * BLOCK,
+                                min((block + 1) * BLOCK, len(self.user_ids))):
+                edges.extend(self.follows_rows(rng, number))
+            Follow.objects.bulk_create(edges)
+            created += len(edges)
+        return created
+
+    def follows_rows(self, rng, number):
+        # Число подписок - распределение Парето со средним --follows.
+        count = min(int(rng.paretovariate(1.5) * self.options['follows'] / 3),
+                    MAX_FOLLOWS, len(self.popular))
+        authors = {pick(rng, self.popular, self.popular_weights)
+                   for _ in range(count)}
+        authors.discard(number)
+        user_id = self.user_ids[number]
+        return [Follow(user_id=user_id, author_id=self.user_ids[author])
+                for author in sorted(authors)]
+
+    def comments(self):
+        if not self.post_ids:
+            return 0
+        done = self.seeded(Comment.objects, 'author__username').count()
+        return self.insert(Comment, 'comments', self.options['comments'],
+                           done)
+
+    def comments_row(self, rng, number):
+        # Комментируют в основном свежие посты.
+        total = len(self.post_ids)
+        post = total - 1 - int(total * rng.random() ** 3)
+        return Comment(
+            post_id=self.post_ids[post],
+            author_id=self.user_ids[
+                pick(rng, self.commenters, self.commenters_weights)],
+            text=rng.choice(self.sentences),
+            created=self.pub_date(post) + datetime.timedelta(
+                seconds=rng.expovariate(1 / COMMENT_DELAY)))
@@ -0,0 +1,94 @@
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait)
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post
+
+BATCH_SIZE = 500
+# Заданий в работе на один процесс.
+WINDOW = 2
+
+
+def _warm(names):
+    failed = []
+    for name in names:
+        try:
+            thumbnails.generate(name)
+        except Exception as error:
+            failed.append(f'{name}: {error}')
+    return len(names), failed
+
+
+class Command(BaseCommand):
+    help = ('Строит миниатюры для уже загруженных картинок постов '
+            'в нескольких процессах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Число процессов.')
+        parser.add_argument('--chunk', type=int, default=20,
+                            help='Картинок на одно задание процесса.')
+
+    def names(self):
+        """Имена картинок по возрастанию pk. Страницы читаются целиком,
+        так что между ними соединение с базой можно закрыть."""
+        posts = (Post.objects.exclude(image='').order_by('pk')
+                 .values_list('pk', 'image'))
+        last = 0
+        while True:
+            page = list(posts.filter(pk__gt=last)[:BATCH_SIZE])
+            for _, name in page:
+                yield name
+            if len(page) < BATCH_SIZE:
+                return
+            last = page[-1][0]
+
+    def batches(self, size):
+        batch = []
+        for name in self.names():
+            batch.append(name)
+            if len(batch) == size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def submitted(self, pool, batches, window):
+        """Результаты заданий; в работе не больше window заданий, так что
+        список картинок не читается в память целиком."""
+        pending = set()
+        for batch in batches:
+            if len(pending) >= window:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield future.result()
+            # Процессы создаются в submit и не должны наследовать открытое
+            # соединение.
+            connections.close_all()
+            pending.add(pool.submit(_warm, batch))
+        for future in as_completed(pending):
+            yield future.result()
+
+    def handle(self, *args, workers, chunk, **options):
+        batches = self.batches(chunk)
+        done = 0
+        if workers > 1:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            results = self.submitted(pool, batches, workers * WINDOW)
+        else:
+            pool, results = None, map(_warm, batches)
+        try:
+            for count, failed in results:
+                done += count
+                for line in failed:
+                    self.stderr.write(line)
+                self.stdout.write(f'Обработано картинок: {done}')
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры готовы для {done} картинок'))
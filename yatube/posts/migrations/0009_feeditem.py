@@ -0,0 +1,55 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_feeds(apps, schema_editor):
+    # Одним INSERT ... SELECT, без выборки подписок и постов в Python.
+    Follow = apps.get_model('posts', 'Follow')
+    FeedItem = apps.get_model('posts', 'FeedItem')
+    rows = (Follow.objects.filter(author__posts__isnull=False).order_by()
+            .values_list('user_id', 'author__posts__id', 'author_id',
+                         'author__posts__pub_date'))
+    sql, params = rows.query.sql_with_params()
+    schema_editor.execute(
+        f'INSERT INTO {FeedItem._meta.db_table} '
+        f'(user_id, post_id, author_id, pub_date) ' + sql, params)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0008_auto_20221010_2028'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField()),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to='posts.Post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-pub_date', '-post_id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='posts_feed_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['user', 'author'], name='posts_feed_user_author_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='feeditem',
+            unique_together={('user', 'post')},
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:30
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def _count(model, field):
+    """COUNT(*) строк model, у которых field ссылается на внешнюю строку."""
+    rows = (model.objects.filter(**{field: OuterRef('pk')}).order_by()
+            .values(field).annotate(total=Count('pk')).values('total'))
+    return Coalesce(Subquery(rows), 0)
+
+
+def fill_counters(apps, schema_editor):
+    # Несколько UPDATE ... SET x = (SELECT COUNT(*) ...) вместо запросов
+    # на каждого пользователя и пост.
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserStats = apps.get_model('posts', 'UserStats')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    schema_editor.execute(
+        f'INSERT INTO {UserStats._meta.db_table} (user_id, posts_count, '
+        f'followers_count, following_count) '
+        f'SELECT id, 0, 0, 0 FROM {User._meta.db_table}')
+    UserStats.objects.update(
+        posts_count=_count(Post, 'author'),
+        followers_count=_count(Follow, 'author'),
+        following_count=_count(Follow, 'user'),
+    )
+    Post.objects.update(comment_count=_count(Comment, 'post'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0009_feeditem'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('followers_count', models.PositiveIntegerField(db_index=True, default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+import re
+from itertools import islice
+
+BATCH_SIZE = 500
+HASHTAG = re.compile(r'(?<![\w&#])#(\w{1,50})(?!\w)')
+
+
+def fill_tags(apps, schema_editor):
+    # Пачками: на пачку постов два запроса за хештегами и одна вставка,
+    # как в tags.rebuild().
+    Post = apps.get_model('posts', 'Post')
+    Tag = apps.get_model('posts', 'Tag')
+    PostTag = apps.get_model('posts', 'PostTag')
+    posts = (Post.objects.order_by().values_list('pk', 'text', 'pub_date')
+             .iterator(chunk_size=BATCH_SIZE))
+    while True:
+        batch = [(pk, pub_date, {name.lower().replace('ё', 'е')
+                                 for name in HASHTAG.findall(text)})
+                 for pk, text, pub_date in islice(posts, BATCH_SIZE)]
+        if not batch:
+            return
+        names = set().union(*(names for _, _, names in batch))
+        Tag.objects.bulk_create([Tag(name=name) for name in names],
+                                ignore_conflicts=True)
+        tag_ids = dict(Tag.objects.filter(name__in=names)
+                       .values_list('name', 'pk'))
+        PostTag.objects.bulk_create(
+            PostTag(tag_id=tag_ids[name], post_id=pk, pub_date=pub_date)
+            for pk, pub_date, names in batch for name in names)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Хештег')),
+            ],
+            options={
+                'verbose_name': 'Хештег',
+                'verbose_name_plural': 'Хештеги',
+            },
+        ),
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='posts.Post')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='posts.Tag')),
+            ],
+            options={
+                'ordering': ['-pub_date', '-post_id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(fields=['tag', '-pub_date', '-post'], name='posts_posttag_tag_date_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='posttag',
+            unique_together={('tag', 'post')},
+        ),
+        migrations.RunPython(fill_tags, migrations.RunPython.noop),
+    ]
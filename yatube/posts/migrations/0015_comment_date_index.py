@@ -0,0 +1,17 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_tags'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['-created', '-id'], name='posts_comment_date_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:31
+
+from django.db import migrations, models
+from itertools import islice
+
+BATCH_SIZE = 500
+
+
+def _fill(model, field, rows):
+    # Строчные в Python: lower() в SQLite меняет регистр только ASCII.
+    rows = rows.order_by().iterator(chunk_size=BATCH_SIZE)
+    while True:
+        batch = [model(pk=pk, **{field: text.lower()})
+                 for pk, text in islice(rows, BATCH_SIZE)]
+        if not batch:
+            return
+        model.objects.bulk_update(batch, [field])
+
+
+def fill_keys(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    UserStats = apps.get_model('posts', 'UserStats')
+    _fill(Group, 'title_key', Group.objects.values_list('pk', 'title'))
+    _fill(UserStats, 'username_key',
+          UserStats.objects.values_list('pk', 'user__username'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_comment_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='title_key',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='username_key',
+            field=models.CharField(db_index=True, default='', max_length=150),
+        ),
+        migrations.RunPython(fill_keys, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 
+from core.storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -9,11 +11,31 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(null=False, unique=True)
     description = models.TextField()
+    # Название строчными для поиска по префиксу без учёта регистра;
+    # заполняет сигнал group_saving.
+    title_key = models.CharField(max_length=200, db_index=True, default='',
+                                 editable=False)
 
     def __str__(self):
         return self.title
 
 
+class UserStats(models.Model):
+    """Счётчики пользователя, которые поддерживают сигналы posts.signals;
+    команда recount пересчитывает их по таблицам."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats')
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0, db_index=True)
+    following_count = models.PositiveIntegerField(default=0)
+    # Имя пользователя строчными для подсказок (см. posts.autocomplete).
+    username_key = models.CharField(max_length=150, db_index=True,
+                                    default='')
+
+
 class Post(models.Model):
     text = models.TextField(verbose_name="Текст поста",
                             help_text='Введите текст поста')
@@ -36,13 +58,24 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    modified = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='posts_post_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='posts_post_author_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='posts_post_group_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -68,6 +101,14 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created', 'id'],
+                         name='posts_comment_post_date_idx'),
+            models.Index(fields=['-created', '-id'],
+                         name='posts_comment_date_idx'),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -92,3 +133,65 @@ class Follow(models.Model):
                 message='Действие невозможно',
                 code='unique_together',
             )
+
+
+class FeedItem(models.Model):
+    """Строка материализованной ленты подписок: пост автора, на которого
+    подписан user. Заполняется при публикации (fan-out on write)."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_items')
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+')
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date', '-post_id']
+        unique_together = ('user', 'post',)
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='posts_feed_user_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='posts_feed_user_author_idx'),
+        ]
+
+
+class Tag(models.Model):
+    name = models.CharField('Хештег', max_length=50, unique=True)
+
+    class Meta:
+        verbose_name = 'Хештег'
+        verbose_name_plural = 'Хештеги'
+
+    def __str__(self):
+        return f'#{self.name}'
+
+
+class PostTag(models.Model):
+    """Строка обратного индекса хештег → пост. pub_date скопирована
+    из поста, чтобы лента хештега читалась одним диапазоном индекса
+    (tag, pub_date). Поддерживается сигналами (см. posts.tags)."""
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='post_tags')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='post_tags')
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date', '-post_id']
+        unique_together = ('tag', 'post',)
+        indexes = [
+            models.Index(fields=['tag', '-pub_date', '-post'],
+                         name='posts_posttag_tag_date_idx'),
+        ]
@@ -0,0 +1,179 @@
+import base64
+import binascii
+import json
+
+from django.core.paginator import Paginator
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.functional import cached_property
+
+NEXT = 'next'
+PREVIOUS = 'prev'
+# Целые в базе 64-битные: большее число в курсоре дало бы OverflowError.
+MAX_INT = 2 ** 63 - 1
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CountedPaginator(Paginator):
+    """Номерной пагинатор, который берёт общее число объектов у count
+    (обычно из кэша счётчиков) вместо SELECT COUNT(*)."""
+
+    window = 5
+
+    def __init__(self, object_list, per_page, count):
+        super().__init__(object_list, per_page)
+        self._count = count
+
+    @cached_property
+    def count(self):
+        return self._count()
+
+    def page(self, number):
+        page = super().page(number)
+        self.page_window = range(max(1, page.number - self.window),
+                                 min(self.num_pages,
+                                     page.number + self.window) + 1)
+        return page
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор админки для больших таблиц: без полного COUNT(*).
+
+    Для таблицы без фильтров число строк оценивается (reltuples
+    в PostgreSQL, иначе максимальный id по индексу первичного ключа),
+    а отфильтрованные строки считаются не дальше count_limit.
+    """
+
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if queryset.query.where:
+            return queryset.order_by()[:self.count_limit].count()
+        return self.estimate(queryset)
+
+    @staticmethod
+    def estimate(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples FROM pg_class '
+                               'WHERE oid = %s::regclass',
+                               [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            # -1 у таблицы, по которой ещё не было ANALYZE.
+            if row and row[0] >= 0:
+                return int(row[0])
+        return queryset.aggregate(last=Max('pk'))['last'] or 0
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинатор: страница выбирается курсором по паре полей
+    (по умолчанию pub_date, id), без COUNT(*) и OFFSET.
+
+    Навигация идёт через атрибуты пагинатора has_next, has_previous,
+    next_cursor и previous_cursor: методы Page, завязанные на num_pages,
+    выполнили бы тот самый COUNT, от которого мы уходим.
+    """
+
+    is_keyset = True
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-pk')):
+        super().__init__(object_list, per_page)
+        self.ordering = tuple(ordering)
+        self.descending = self.ordering[0].startswith('-')
+        self.fields = tuple(name.lstrip('-') for name in self.ordering)
+        self.cursor = None
+        self.has_next = self.has_previous = False
+        self.next_cursor = self.previous_cursor = None
+
+    def position(self, obj):
+        """Ключ объекта в ленте."""
+        return tuple(getattr(obj, name) for name in self.fields)
+
+    def fetch(self, position, backwards, limit):
+        """Возвращает до limit объектов, идущих за position в порядке
+        обхода: по ленте или, если backwards, против неё."""
+        queryset = self.object_list
+        if position is not None:
+            queryset = queryset.filter(self._after(position, backwards))
+        ordering = self.ordering
+        if backwards:
+            ordering = tuple(self._flip(name) for name in ordering)
+        return list(queryset.order_by(*ordering)[:limit])
+
+    def _after(self, position, backwards, fields=None):
+        (first, second), (value, tiebreak) = fields or self.fields, position
+        lookup = 'gt' if self.descending == backwards else 'lt'
+        return (
+            Q(**{f'{first}__{lookup}': value})
+            | Q(**{first: value, f'{second}__{lookup}': tiebreak})
+        )
+
+    @staticmethod
+    def _flip(name):
+        return name[1:] if name.startswith('-') else '-' + name
+
+    def encode(self, direction, obj):
+        # Микросекунды сохраняем полностью: DjangoJSONEncoder их обрезает,
+        # и курсор перестал бы совпадать с ключом в базе.
+        payload = json.dumps([direction, *self.position(obj)],
+                             default=lambda value: value.isoformat())
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def to_python(self, name, value):
+        meta = self.object_list.model._meta
+        field = meta.pk if name == 'pk' else meta.get_field(name)
+        return field.to_python(value)
+
+    def decode(self, cursor):
+        try:
+            direction, *values = json.loads(
+                base64.urlsafe_b64decode(cursor.encode()))
+            if direction not in (NEXT, PREVIOUS):
+                raise InvalidCursor(cursor)
+            if len(values) != len(self.fields):
+                raise InvalidCursor(cursor)
+            position = tuple(
+                self.to_python(name, value)
+                for name, value in zip(self.fields, values)
+            )
+        except (ValueError, TypeError, binascii.Error, ValidationError):
+            raise InvalidCursor(cursor)
+        if None in position or any(
+                isinstance(value, int) and not -MAX_INT <= value <= MAX_INT
+                for value in position):
+            raise InvalidCursor(cursor)
+        return direction, position
+
+    def get_cursor_page(self, cursor=None):
+        """Страница, на которую указывает курсор; битый или пустой курсор
+        даёт первую страницу, как get_page() для неверного номера."""
+        try:
+            direction, position = (
+                self.decode(cursor) if cursor else (NEXT, None))
+        except InvalidCursor:
+            cursor, direction, position = None, NEXT, None
+        self.cursor = cursor
+        backwards = direction == PREVIOUS
+        rows = self.fetch(position, backwards, self.per_page + 1)
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            if not more:
+                # Дошли до начала ленты: показываем полную первую страницу.
+                return self.get_cursor_page(None)
+            rows.reverse()
+            self.has_previous = self.has_next = True
+        else:
+            self.has_previous, self.has_next = position is not None, more
+        if rows and self.has_previous:
+            self.previous_cursor = self.encode(PREVIOUS, rows[0])
+        if rows and self.has_next:
+            self.next_cursor = self.encode(NEXT, rows[-1])
+        return self._get_page(rows, 1, self)
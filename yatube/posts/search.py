@@ -0,0 +1,168 @@
+"""Полнотекстовый поиск по тексту постов на SQLite FTS5.
+
+Индекс posts_post_fts хранит только токены (contentless), сам текст
+остаётся в posts_post. В синхроне индекс держат триггеры, поэтому он
+видит и bulk_create, и update(). Таблицу и триггеры создаёт install()
+после каждого migrate: SQLite пересоздаёт таблицу при изменении схемы,
+и триггеры на старой таблице пропали бы вместе с ней.
+
+Токенизатор unicode61 приводит кириллицу к нижнему регистру, а ё
+и в индексе, и в запросе заменяется на е. Стеммера для русского в SQLite
+нет, поэтому у слов запроса отрезаются типичные окончания и ищется
+префикс: «котами» находит и «кот», и «котик». Результаты упорядочены
+по bm25.
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from .paginators import CursorPaginator
+
+TABLE = 'posts_post_fts'
+MAX_TERMS = 10
+MIN_STEM = 3
+# Окончания от длинных к коротким: отрезается первое подошедшее.
+ENDINGS = sorted((
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ать', 'ять', 'ить', 'еть', 'ешь', 'ишь', 'ете', 'ите',
+    'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ой', 'ей', 'ий', 'ый', 'ом',
+    'ем', 'ам', 'ям', 'ах', 'ях', 'ов', 'ев', 'ую', 'юю', 'ть', 'ся',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+), key=len, reverse=True)
+
+
+def _normalized(column):
+    # unicode61 не считает ё буквой с диакритикой: сводим её к е сами.
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+SCHEMA = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+        text, content='', tokenize='unicode61', prefix='3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_insert
+        AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {TABLE} (rowid, text)
+        VALUES (new.id, {_normalized('new.text')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_delete
+        AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {TABLE} ({TABLE}, rowid, text)
+        VALUES ('delete', old.id, {_normalized('old.text')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_update
+        AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO {TABLE} ({TABLE}, rowid, text)
+        VALUES ('delete', old.id, {_normalized('old.text')});
+        INSERT INTO {TABLE} (rowid, text)
+        VALUES (new.id, {_normalized('new.text')});
+    END""",
+)
+
+
+def available(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def _objects(cursor):
+    cursor.execute(
+        "SELECT name FROM sqlite_master WHERE name LIKE %s",
+        [TABLE + '%'])
+    return {row[0] for row in cursor.fetchall()}
+
+
+def install(using=connection):
+    """Создаёт индекс и триггеры, если их нет; новый или осиротевший
+    индекс заполняет заново."""
+    if not available(using):
+        return
+    with using.cursor() as cursor:
+        before = _objects(cursor)
+        for statement in SCHEMA:
+            cursor.execute(statement)
+        if _objects(cursor) != before:
+            rebuild(using)
+
+
+def drop_triggers(using=connection):
+    """Снимает триггеры индекса на время массовой загрузки; install()
+    вернёт их и перестроит индекс целиком."""
+    if not available(using):
+        return
+    with using.cursor() as cursor:
+        for event in ('insert', 'delete', 'update'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {TABLE}_{event}')
+
+
+def rebuild(using=connection):
+    with using.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {TABLE} ({TABLE}) VALUES ('delete-all')")
+        cursor.execute(
+            f"INSERT INTO {TABLE} (rowid, text) "
+            f"SELECT id, {_normalized('text')} FROM posts_post")
+
+
+def stem(word):
+    if re.search('[а-яё]', word):
+        for ending in ENDINGS:
+            if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+                return word[:-len(ending)]
+    return word
+
+
+def match_query(text):
+    """Выражение MATCH для строки пользователя или '' для пустой.
+    Каждое слово ищется как префикс; слова берутся только из букв
+    и цифр, так что синтаксис FTS5 из запроса не пройдёт."""
+    words = re.findall(r'\w+', text.lower().replace('ё', 'е'))[:MAX_TERMS]
+    return ' '.join(f'"{stem(word)}"*' for word in words)
+
+
+def matching_ids(query):
+    """Подзапрос id постов, подходящих под match_query."""
+    return RawSQL(f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s',
+                  [query])
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсорный пагинатор по результатам поиска: порядок по bm25, при
+    равном ранге по id. Курсор хранит ранг и id последнего поста."""
+
+    def __init__(self, query, per_page):
+        super().__init__(Post.objects.all(), per_page,
+                         ordering=('search_rank', 'pk'))
+        self.query = query
+
+    def to_python(self, name, value):
+        if name == 'search_rank':
+            return float(value)
+        return super().to_python(name, value)
+
+    def fetch(self, position, backwards, limit):
+        if not self.query:
+            return []
+        sql = (f'SELECT rowid, bm25({TABLE}) AS search_rank FROM {TABLE} '
+               f'WHERE {TABLE} MATCH %s')
+        params = [self.query]
+        if position is not None:
+            sql += ' AND (search_rank, rowid) %s (%%s, %%s)' % (
+                '<' if backwards else '>')
+            params += position
+        direction = 'DESC' if backwards else 'ASC'
+        sql += (f' ORDER BY search_rank {direction}, rowid {direction}'
+                ' LIMIT %s')
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            ranks = dict(cursor.fetchall())
+        posts = (Post.objects.select_related('author', 'group')
+                 .in_bulk(list(ranks)))
+        rows = []
+        for pk, rank in ranks.items():
+            if pk in posts:
+                posts[pk].search_rank = rank
+                rows.append(posts[pk])
+        return rows
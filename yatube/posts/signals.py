@@ -0,0 +1,140 @@
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models.signals import (
+    post_delete, post_migrate, post_save, pre_save)
+from django.dispatch import receiver
+
+from . import counters, feeds, search, tags, versions
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    if raw:
+        return
+    username_key = instance.username.lower()
+    if created:
+        UserStats.objects.get_or_create(
+            user=instance, defaults={'username_key': username_key})
+        versions.accounts_changed()
+    elif update_fields is None or {
+            'username', 'first_name', 'last_name'} & set(update_fields):
+        # Имя автора видно во всех лентах; вход в систему (last_login)
+        # кэш не трогает.
+        UserStats.objects.filter(user=instance).exclude(
+            username_key=username_key).update(username_key=username_key)
+        versions.users_changed()
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    versions.accounts_changed()
+
+
+@receiver(pre_save, sender=Group)
+def group_saving(sender, instance, **kwargs):
+    instance.title_key = instance.title.lower()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        versions.groups_changed()
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, raw=False, **kwargs):
+    instance._saved_group_id = instance._saved_image = None
+    # Новая загрузка ещё не записана: её сохранит поле уже после сигнала.
+    instance._image_uploaded = (
+        bool(instance.image) and not instance.image._committed)
+    if instance.pk and not raw:
+        instance._saved_group_id, instance._saved_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'image').first() or (None, None))
+
+
+@receiver(post_save, sender=Post)
+def post_published(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.bump_user(instance.author_id, 'posts_count', 1)
+        counters.adjust_post_counts(instance, 1, instance.group_id)
+        feeds.fan_out(instance)
+    elif instance._saved_group_id != instance.group_id:
+        if instance._saved_group_id is not None:
+            counters.adjust_post_count(-1, group_id=instance._saved_group_id)
+        if instance.group_id is not None:
+            counters.adjust_post_count(1, group_id=instance.group_id)
+    tags.index(instance, created)
+    versions.posts_changed(instance.author_id, instance.group_id,
+                           instance._saved_group_id)
+    old_image = instance._saved_image
+    if old_image and (instance._image_uploaded
+                      or old_image != instance.image.name):
+        # Картинку заменили: снимаем ссылку со старого файла.
+        instance.image.storage.delete(old_image)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'posts_count', -1)
+    counters.adjust_post_counts(instance, -1, instance.group_id)
+    versions.posts_changed(instance.author_id, instance.group_id)
+    if instance.image:
+        instance.image.storage.delete(instance.image.name)
+
+
+def _comments_changed(comment):
+    # Число комментариев показано в карточках лент.
+    post = Post.objects.filter(pk=comment.post_id).values(
+        'author_id', 'group_id').first()
+    if post is not None:
+        versions.posts_changed(post['author_id'], post['group_id'])
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.bump_post(instance.post_id, 1)
+        _comments_changed(instance)
+    # Правка текста в админке тоже меняет порцию на странице поста.
+    versions.comments_changed(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.bump_post(instance.post_id, -1)
+    _comments_changed(instance)
+    versions.comments_changed(instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_user(instance.author_id, 'followers_count', 1)
+        counters.bump_user(instance.user_id, 'following_count', 1)
+        feeds.backfill(instance.user_id, instance.author_id)
+        versions.follows_changed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'followers_count', -1)
+    counters.bump_user(instance.user_id, 'following_count', -1)
+    feeds.prune(instance.user_id, instance.author_id)
+    feeds.follower_lost(instance.author_id)
+    versions.follows_changed(instance.user_id, instance.author_id)
+
+
+@receiver(post_migrate)
+def search_installed(sender, using, **kwargs):
+    if sender.name == 'posts':
+        search.install(connections[using])
@@ -0,0 +1,84 @@
+"""Хештеги постов и обратный индекс PostTag.
+
+Хештеги разбираются из текста при сохранении поста: сигнал сравнивает
+их с уже проиндексированными и добавляет или удаляет только разницу.
+При удалении поста строки индекса уходят каскадом. Лента хештега
+читает индекс (tag, pub_date) одним диапазоном на страницу.
+"""
+import re
+from itertools import islice
+
+from django.utils.html import conditional_escape, format_html
+from django.utils.safestring import mark_safe
+from django.urls import reverse
+
+from .models import Post, PostTag, Tag
+
+REBUILD_BATCH_SIZE = 500
+MAX_LENGTH = Tag._meta.get_field('name').max_length
+# Решётка в начале слова: адреса вида page#anchor хештегами не считаются.
+HASHTAG = re.compile(r'(?<![\w&#])#(\w{1,%d})(?!\w)' % MAX_LENGTH)
+
+
+def normalize(name):
+    return name.lower().replace('ё', 'е')
+
+
+def extract(text):
+    """Множество хештегов текста в нормальной форме, без решётки."""
+    return {normalize(name) for name in HASHTAG.findall(text)}
+
+
+def _tag_ids(names):
+    Tag.objects.bulk_create([Tag(name=name) for name in names],
+                            ignore_conflicts=True)
+    return dict(Tag.objects.filter(name__in=names)
+                .values_list('name', 'pk'))
+
+
+def index(post, created=False):
+    """Приводит строки PostTag поста в соответствие с его текстом."""
+    names = extract(post.text)
+    indexed = {} if created else dict(
+        PostTag.objects.filter(post=post).values_list('tag__name', 'pk'))
+    stale = [pk for name, pk in indexed.items() if name not in names]
+    if stale:
+        PostTag.objects.filter(pk__in=stale).delete()
+    added = names - set(indexed)
+    if added:
+        PostTag.objects.bulk_create(
+            [PostTag(tag_id=tag_id, post_id=post.pk, pub_date=post.pub_date)
+             for tag_id in _tag_ids(added).values()],
+            ignore_conflicts=True)
+
+
+def rebuild():
+    """Пересобирает индекс по всем постам пачками по REBUILD_BATCH_SIZE."""
+    PostTag.objects.all().delete()
+    posts = (Post.objects.order_by().values_list('pk', 'text', 'pub_date')
+             .iterator(chunk_size=REBUILD_BATCH_SIZE))
+    while True:
+        batch = [(pk, pub_date, extract(text))
+                 for pk, text, pub_date in islice(posts, REBUILD_BATCH_SIZE)]
+        if not batch:
+            return
+        tag_ids = _tag_ids(set().union(*(names for _, _, names in batch)))
+        PostTag.objects.bulk_create(
+            PostTag(tag_id=tag_ids[name], post_id=pk, pub_date=pub_date)
+            for pk, pub_date, names in batch for name in names)
+
+
+def linkify(text):
+    """Текст поста с хештегами-ссылками на их ленты; остальное
+    экранируется."""
+    parts = []
+    position = 0
+    for match in HASHTAG.finditer(text):
+        parts.append(conditional_escape(text[position:match.start()]))
+        parts.append(format_html(
+            '<a href="{}">{}</a>',
+            reverse('posts:tag_posts', args=[normalize(match.group(1))]),
+            match.group(0)))
+        position = match.end()
+    parts.append(conditional_escape(text[position:]))
+    return mark_safe(''.join(parts))
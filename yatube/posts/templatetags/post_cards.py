@@ -0,0 +1,50 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core import generations
+from posts import tags, thumbnails
+
+register = template.Library()
+
+
+def card_key(post, variant, shared):
+    modified = int(post.modified.timestamp() * 1000000)
+    return f'post_card:{variant}:{post.pk}:{modified}:{shared}'
+
+
+@register.simple_tag
+def post_cards(posts, variant='feed'):
+    """HTML карточек постов ленты из кэша одним get_many; рендерятся только
+    отсутствующие. Ключ карточки меняется вместе с Post.modified и с
+    поколениями имён авторов и групп."""
+    posts = list(posts)
+    shared = '.'.join(map(str, generations.get_many('users', 'groups')))
+    keys = [card_key(post, variant, shared) for post in posts]
+    cached = cache.get_many(keys)
+    # Миниатюры нужны только тем карточкам, которых нет в кэше.
+    thumbnails.attach(post for post, key in zip(posts, keys)
+                      if key not in cached)
+    rendered = {}
+    cards = []
+    for post, key in zip(posts, keys):
+        card = cached.get(key)
+        if card is None:
+            card = render_to_string('posts/includes/post_card.html',
+                                    {'post': post, 'variant': variant})
+            # Без готовой миниатюры карточку не кэшируем: картинка
+            # появится, когда её построит фоновый поток.
+            if not post.image or hasattr(post, 'thumbnail'):
+                rendered[key] = card
+        cards.append(card)
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+    return [mark_safe(card) for card in cards]
+
+
+@register.filter
+def hashtags(text):
+    """Текст поста с хештегами-ссылками на ленты хештегов."""
+    return tags.linkify(text)
@@ -0,0 +1,135 @@
+from datetime import datetime
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.admin import IndexedDatesQuerySet, PostAdmin
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+# Сессия и пользователь, ключи и строки страницы, оценка числа строк,
+# справочник групп и до трёх MIN() для date_hierarchy.
+QUERY_BUDGET = 10
+
+
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'Admin', 'admin@example.com', 'password')
+        groups = [Group.objects.create(title=f'Группа {i}', slug=f'g{i}',
+                                       description='Описание')
+                  for i in range(3)]
+        authors = [User.objects.create_user(username=f'Admin_Author_{i}')
+                   for i in range(4)]
+        cls.posts = [Post.objects.create(text=f'Пост {i}',
+                                         author=authors[i % 4],
+                                         group=groups[i % 3])
+                     for i in range(30)]
+        for i, post in enumerate(cls.posts):
+            Comment.objects.create(post=post, author=authors[i % 4],
+                                   text=f'Комментарий {i}')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def get(self, name, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse(f'admin:posts_{name}_changelist'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in queries]
+
+    def test_changelists_within_query_budget(self):
+        """Число запросов на страницу списка не зависит от числа строк:
+        авторы, группы и посты комментариев подтягиваются JOIN."""
+        for name in ('post', 'comment'):
+            with self.subTest(name=name):
+                response, queries = self.get(name)
+                self.assertEqual(
+                    len(response.context['cl'].result_list), 30)
+                self.assertLessEqual(len(queries), QUERY_BUDGET, queries)
+
+    def test_no_full_count(self):
+        """Список не считает всю таблицу: без фильтров число строк
+        оценивается, с фильтром считается не дальше предела."""
+        _, queries = self.get('post')
+        self.assertFalse([sql for sql in queries if 'COUNT(' in sql])
+        _, queries = self.get('post', {'author__id__exact':
+                                       self.posts[0].author_id})
+        counts = [sql for sql in queries if 'COUNT(' in sql]
+        self.assertEqual(len(counts), 1)
+        self.assertIn('LIMIT', counts[0])
+
+    @mock.patch.object(PostAdmin, 'list_per_page', 4)
+    def test_cursor_pages(self):
+        """Страницы идут курсором без OFFSET, фильтры сохраняются."""
+        group = self.posts[0].group
+        params = {'group__id__exact': group.pk}
+        expected = sorted((post for post in self.posts
+                           if post.group == group),
+                          key=lambda post: post.pk, reverse=True)
+        response, _ = self.get('post', params)
+        cl = response.context['cl']
+        self.assertEqual(list(cl.result_list), expected[:4])
+        self.assertIn('group__id__exact', cl.next_url)
+        response, queries = self.get(
+            'post', {**params, 'cursor': cl.paginator.next_cursor})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         expected[4:8])
+        self.assertFalse([sql for sql in queries if 'OFFSET' in sql])
+
+    def test_numbered_pages_when_sorted(self):
+        """При сортировке по колонке работают номерные страницы."""
+        response, _ = self.get('post', {'o': '1'})
+        self.assertFalse(response.context['cl'].keyset)
+
+
+class IndexedDatesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='Dated')
+        cls.admin = User.objects.create_superuser(
+            'DatesAdmin', 'dates@example.com', 'password')
+        moments = (datetime(2020, 12, 31, 23, 30), datetime(2021, 3, 1),
+                   datetime(2021, 3, 15), datetime(2023, 7, 4))
+        # Восемь дней одного месяца и восемь месяцев одного года.
+        moments += tuple(datetime(2022, 5, day, 12) for day in range(1, 9))
+        moments += tuple(datetime(2022, month, 20)
+                         for month in (1, 2, 6, 7, 8, 9, 10, 11))
+        for moment in moments:
+            post = Post.objects.create(text='Пост', author=author)
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=timezone.make_aware(moment))
+
+    def test_dates_match_distinct_query(self):
+        """dates() со скачками по индексу совпадает с DISTINCT-запросом."""
+        queryset = IndexedDatesQuerySet(Post)
+        for kind in ('year', 'month', 'day'):
+            for order in ('ASC', 'DESC'):
+                with self.subTest(kind=kind, order=order):
+                    self.assertEqual(
+                        list(queryset.dates('pub_date', kind, order)),
+                        list(Post.objects.dates('pub_date', kind, order)))
+
+    def test_drill_down_within_query_budget(self):
+        """Год и месяц со многими активными датами открываются: MIN() на
+        каждую дату не принимается за N+1."""
+        client = Client()
+        client.force_login(self.admin)
+        url = reverse('admin:posts_post_changelist')
+        for params, link in (
+                ({'pub_date__year': 2022}, 'pub_date__month=11'),
+                ({'pub_date__year': 2022, 'pub_date__month': 5},
+                 'pub_date__day=8')):
+            with self.subTest(params=params):
+                response = client.get(url, params)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, link)
@@ -0,0 +1,118 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import autocomplete
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class AutocompleteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='Staff', is_staff=True)
+        cls.user = User.objects.create_user(username='котофей')
+        for title in ('Котики', 'коты', 'Собаки'):
+            Group.objects.create(title=title, slug=f'g{len(title)}{title[0]}',
+                                 description='Описание')
+        cls.post = Post.objects.create(text='Пост про котиков',
+                                       author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.staff)
+
+    def suggest(self, kind, term):
+        response = self.client.get(
+            reverse('posts:autocomplete', args=[kind]), {'term': term})
+        self.assertEqual(response.status_code, 200)
+        return [item['text'] for item in response.json()['results']]
+
+    def test_prefix_ignores_case(self):
+        """Поиск идёт по началу названия и не зависит от регистра."""
+        self.assertEqual(self.suggest('groups', 'КОТ'), ['Котики', 'коты'])
+        self.assertEqual(self.suggest('groups', 'ики'), [])
+        self.assertEqual(self.suggest('users', 'Кото'), ['котофей'])
+
+    def test_prefix_finds_mixed_case(self):
+        """Имена в смешанном регистре находятся по любому регистру ввода,
+        в том числе после переименования."""
+        User.objects.create_user(username='JohnDoe')
+        Group.objects.create(title='Лев Толстой', slug='tolstoy',
+                             description='Описание')
+        self.assertEqual(self.suggest('users', 'johnd'), ['JohnDoe'])
+        self.assertEqual(self.suggest('users', 'JOHNd'), ['JohnDoe'])
+        self.assertEqual(self.suggest('groups', 'лев т'), ['Лев Толстой'])
+        self.user.username = 'МурКот'
+        self.user.save()
+        self.assertEqual(self.suggest('users', 'мурк'), ['МурКот'])
+        self.assertEqual(self.suggest('users', 'кото'), [])
+
+    def test_rebuild_fills_keys_of_bulk_rows(self):
+        """Группы из bulk_create находятся после autocomplete.rebuild."""
+        Group.objects.bulk_create([Group(title='ПоЭзия', slug='poetry',
+                                         description='')])
+        autocomplete.rebuild()
+        self.assertEqual(self.suggest('groups', 'поэ'), ['ПоЭзия'])
+
+    def test_posts_by_text_and_id(self):
+        """Посты находятся по словам текста и по id."""
+        label = f'{self.post.pk}: Пост про котиков'
+        self.assertEqual(self.suggest('posts', 'котик'), [label])
+        self.assertEqual(self.suggest('posts', str(self.post.pk)), [label])
+
+    def test_results_cached_until_data_changes(self):
+        """Повторный запрос берётся из кэша; новая группа или новый
+        пользователь видны сразу."""
+        autocomplete.suggest('groups', 'кот')
+        with self.assertNumQueries(0):
+            autocomplete.suggest('groups', 'Кот')
+        Group.objects.create(title='Котлеты', slug='food',
+                             description='Описание')
+        self.assertIn('Котлеты',
+                      dict(autocomplete.suggest('groups', 'кот')).values())
+        autocomplete.suggest('users', 'н')
+        User.objects.create_user(username='Новичок')
+        self.assertIn('Новичок',
+                      dict(autocomplete.suggest('users', 'н')).values())
+
+    def test_access(self):
+        """Группы видны любому пользователю, авторы и посты - только
+        персоналу."""
+        self.client.force_login(self.user)
+        url = reverse('posts:autocomplete', args=['users'])
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.suggest('groups', 'соб'), ['Собаки'])
+        self.assertEqual(
+            self.client.get(reverse('posts:autocomplete',
+                                    args=['nothing'])).status_code, 404)
+
+    def test_forms_do_not_list_tables(self):
+        """Форма поста и карточка поста в админке выводят только
+        выбранные значения, а число запросов не зависит от таблиц."""
+        url = reverse('posts:post_create')
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+        Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'many{i}', description='')
+            for i in range(50))
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(url)
+        self.assertEqual(len(before), len(after))
+        self.assertNotContains(response, 'Группа 1')
+        self.assertContains(
+            response, reverse('posts:autocomplete', args=['groups']))
+
+        admin = User.objects.create_superuser('Boss', 'boss@example.com',
+                                              'password')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_change', args=[self.post.pk]))
+        self.assertContains(response, 'котофей')
+        self.assertNotContains(response, 'Staff')
+        self.assertNotContains(response, 'Котики')
@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.test import TestCase
+
+from posts import benchmarks, counters
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='bench_author')
+        cls.reader = User.objects.create_user(username='bench_reader')
+        cls.group = Group.objects.create(title='Замер', slug='bench')
+        cls.post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text='Пост')
+        Comment.objects.create(post=cls.post, author=cls.reader,
+                               text='Комментарий')
+        counters.recount()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_percentile(self):
+        """Перцентиль по ближайшему рангу."""
+        values = list(range(1, 101))
+        self.assertEqual(benchmarks.percentile(values, 50), 50)
+        self.assertEqual(benchmarks.percentile(values, 99), 99)
+        self.assertEqual(benchmarks.percentile([7], 95), 7)
+
+    def test_counting_caches(self):
+        """Попадания и промахи считаются и для get, и для get_many."""
+        cache.set('bench:a', 1)
+        with benchmarks.counting_caches() as stats:
+            self.assertEqual(cache.get('bench:a'), 1)
+            self.assertEqual(cache.get('bench:b', 'нет'), 'нет')
+            cache.get_many(['bench:a', 'bench:b'])
+        self.assertEqual(stats, {'hits': 2, 'misses': 2})
+        self.assertNotIn('get', vars(caches['default']))
+
+    def test_run_rolls_back_writes(self):
+        """Все сценарии отвечают, записи замера откатываются."""
+        report = benchmarks.run(runs=2, warmup=1)
+        self.assertEqual(list(report['views']),
+                         [scenario.name for scenario in
+                          benchmarks.scenarios()])
+        for result in report['views'].values():
+            self.assertIn(result['status'], (200, 302))
+            self.assertGreater(result['queries'], 0)
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_run_keeps_site_cache(self):
+        """Замер, в том числе холодный, не читает и не очищает кэш сайта."""
+        cache.set('bench:keep', 1)
+        with benchmarks.counting_caches() as stats:
+            benchmarks.run(runs=1, cold=True, names=['index'])
+        self.assertEqual(stats, {})
+        self.assertEqual(cache.get('bench:keep'), 1)
+
+    def test_regressions(self):
+        """Регрессия - рост p95 выше порога или лишние запросы."""
+        baseline = {'views': {'index': {'p95_ms': 10, 'queries': 2}}}
+        slower = {'views': {'index': {'p95_ms': 13, 'queries': 2}}}
+        chattier = {'views': {'index': {'p95_ms': 10, 'queries': 3},
+                              'new': {'p95_ms': 99, 'queries': 9}}}
+        self.assertEqual(benchmarks.regressions(baseline, slower, 0.5), [])
+        self.assertEqual(len(benchmarks.regressions(baseline, slower)), 1)
+        self.assertEqual(benchmarks.regressions(baseline, chattier),
+                         ['index: запросов 2 -> 3'])
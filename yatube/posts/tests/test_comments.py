@@ -0,0 +1,99 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+NUMBER = re.compile(r'Комментарий №(\d+)')
+MORE = re.compile(r'data-url="([^"]+)"')
+FALLBACK = re.compile(r'href="([^"]+\?comments=[^"]+)"')
+
+
+@override_settings(COMMENTS_PER_PAGE=3)
+class CommentChunksTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='commenter')
+        cls.post = Post.objects.create(text='Обсуждаемый пост',
+                                       author=cls.user)
+        cls.authors = [User.objects.create_user(username=f'reader{i}')
+                       for i in range(7)]
+        for number, author in enumerate(cls.authors):
+            Comment.objects.create(post=cls.post, author=author,
+                                   text=f'Комментарий №{number}')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.detail_url = reverse('posts:post_detail', args=[self.post.pk])
+
+    def numbers(self, response):
+        return [int(number) for number in
+                NUMBER.findall(response.content.decode())]
+
+    def next_url(self, response):
+        found = MORE.search(response.content.decode())
+        return found and found.group(1)
+
+    def test_post_detail_shows_first_chunk(self):
+        """На странице поста первые комментарии по порядку и кнопка
+        следующей порции."""
+        response = self.client.get(self.detail_url)
+        self.assertEqual(self.numbers(response), [0, 1, 2])
+        self.assertTrue(self.next_url(response))
+
+    def test_load_more_walks_all_comments(self):
+        """Кнопка отдаёт только HTML порции, и порции по цепочке дают все
+        комментарии без повторов."""
+        response = self.client.get(self.detail_url)
+        seen = self.numbers(response)
+        url = self.next_url(response)
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotContains(response, '<form')
+            self.assertNotContains(response, 'Обсуждаемый пост')
+            seen += self.numbers(response)
+            url = self.next_url(response)
+        self.assertEqual(seen, list(range(7)))
+
+    def test_fallback_link_without_javascript(self):
+        """Ссылка кнопки без JavaScript открывает страницу поста
+        со следующей порцией."""
+        response = self.client.get(self.detail_url)
+        url = FALLBACK.search(response.content.decode()).group(1)
+        response = self.client.get(url)
+        self.assertEqual(self.numbers(response), [3, 4, 5])
+        self.assertContains(response, 'Обсуждаемый пост')
+
+    def test_broken_cursor_gives_first_chunk(self):
+        url = reverse('posts:post_comments', args=[self.post.pk])
+        response = self.client.get(url + '?cursor=broken')
+        self.assertEqual(self.numbers(response), [0, 1, 2])
+
+    def test_chunk_cached_until_new_comment(self):
+        """Повторная порция берётся из кэша без выборки комментариев,
+        а новый комментарий сбрасывает кэш."""
+        response = self.client.get(self.detail_url)
+        url = self.next_url(response)
+        with self.assertNumQueries(2):
+            self.client.get(url)
+        # Остаётся только проверка, что пост существует.
+        with self.assertNumQueries(1):
+            self.client.get(url)
+        self.client.post(reverse('posts:add_comment', args=[self.post.pk]),
+                         {'text': 'Комментарий №7'})
+        while url:
+            response = self.client.get(url)
+            url = self.next_url(response)
+        self.assertEqual(self.numbers(response), [6, 7])
+
+    def test_missing_post(self):
+        url = reverse('posts:post_comments', args=[self.post.pk + 100])
+        self.assertEqual(self.client.get(url).status_code, 404)
@@ -0,0 +1,131 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import counters
+from posts.models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Counted')
+        cls.reader = User.objects.create_user(username='Counter_Reader')
+
+    def setUp(self):
+        self.client = Client()
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_creates_and_deletes(self):
+        """Счётчики следуют за созданием и удалением объектов."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+
+        follow.delete()
+        post.comments.all().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+
+    def test_recount_repairs_drift(self):
+        """recount чинит разошедшиеся счётчики и недостающие строки."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        UserStats.objects.filter(user=self.author).update(posts_count=42)
+        UserStats.objects.filter(user=self.reader).delete()
+        Post.objects.update(comment_count=7)
+        call_command('recount', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.reader).posts_count, 0)
+
+    def test_profile_reads_counts_without_count_queries(self):
+        """Профиль показывает число постов без COUNT."""
+        Post.objects.create(text='Пост', author=self.author)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('posts:profile', args=[self.author.username]))
+        self.assertEqual(response.context['posts_count'], 1)
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+
+
+class PostCountCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Paged')
+        cls.group = Group.objects.create(title='Группа', slug='paged',
+                                         description='Описание')
+        for i in range(12):
+            Post.objects.create(text=f'Пост {i}', author=cls.author,
+                                group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_numbered_pages_skip_count_when_cached(self):
+        """Номерные страницы берут число постов из кэша."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.client.get(url, {'page': 2})
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, {'page': 2})
+                self.assertEqual(len(response.context['page_obj']), 2)
+                for query in queries.captured_queries:
+                    self.assertNotIn('COUNT(', query['sql'].upper())
+
+    def test_counts_follow_saves_and_deletes(self):
+        """Кэшированные числа меняются на дельту при сохранении и удалении."""
+        self.assertEqual(counters.post_count(group_id=self.group.pk), 12)
+        self.assertEqual(counters.post_count(), 12)
+        post = Post.objects.create(text='Ещё', author=self.author)
+        self.assertEqual(counters.post_count(), 13)
+        post.group = self.group
+        post.save()
+        self.assertEqual(counters.post_count(group_id=self.group.pk), 13)
+        post.delete()
+        self.assertEqual(counters.post_count(group_id=self.group.pk), 12)
+        self.assertEqual(counters.post_count(author_id=self.author.pk), 12)
+
+    def test_reconcile_repairs_drift(self):
+        """reconcile_counts возвращает точные числа."""
+        cache.set('posts:count', 100)
+        call_command('reconcile_counts', stdout=StringIO())
+        self.assertEqual(counters.post_count(), 12)
+        self.assertEqual(counters.post_count(group_id=self.group.pk), 12)
+
+    @override_settings(POST_COUNT_ESTIMATE=True)
+    def test_estimate_mode_avoids_count(self):
+        """В режиме оценки число постов считается без COUNT."""
+        with CaptureQueriesContext(connection) as queries:
+            estimate = counters.post_count()
+            by_author = counters.post_count(author_id=self.author.pk)
+        self.assertGreaterEqual(estimate, 12)
+        self.assertEqual(by_author, 12)
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
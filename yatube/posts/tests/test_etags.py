@@ -0,0 +1,100 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import http_date
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Etag_Author')
+        cls.reader = User.objects.create_user(username='Etag_Reader')
+        cls.group = Group.objects.create(title='Группа', slug='etags',
+                                         description='Описание')
+        cls.post = Post.objects.create(text='Пост', author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        )
+
+    def test_unchanged_page_gives_304_without_rendering(self):
+        """Та же версия страницы отдаётся 304 без выборки постов."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.guest.get(url)['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.guest.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertIn('Cookie', response['Vary'])
+                self.assertLessEqual(len(queries), 1)
+
+    def edit_comment(self):
+        comment = Comment.objects.get(post=self.post)
+        comment.text = 'Исправленный комментарий'
+        comment.save()
+
+    def test_etag_changes_with_content(self):
+        """Новый пост, новый и исправленный комментарий и подписка меняют
+        ETag своих страниц."""
+        index, group, profile, detail = self.urls
+        changes = (
+            ((index, group, profile), lambda: Post.objects.create(
+                text='Ещё', author=self.author, group=self.group)),
+            ((detail,), lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий')),
+            ((detail,), self.edit_comment),
+            ((profile,), lambda: Follow.objects.create(
+                user=self.reader, author=self.author)),
+        )
+        for urls, change in changes:
+            old = [self.reader_client.get(url)['ETag'] for url in urls]
+            change()
+            new = [self.reader_client.get(url)['ETag'] for url in urls]
+            for url, before, after in zip(urls, old, new):
+                with self.subTest(url=url):
+                    self.assertNotEqual(before, after)
+
+    def test_etag_depends_on_reader_and_page(self):
+        """ETag зависит от читателя и от курсора страницы."""
+        url = reverse('posts:index')
+        self.assertNotEqual(self.guest.get(url)['ETag'],
+                            self.reader_client.get(url)['ETag'])
+        self.assertNotEqual(self.guest.get(url)['ETag'],
+                            self.guest.get(url, {'page': 1})['ETag'])
+
+    def test_post_detail_ignores_if_modified_since(self):
+        """Страница поста не отдаёт Last-Modified, и If-Modified-Since
+        не даёт устаревший 304 после нового поста автора."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        response = self.guest.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        since = http_date(self.post.modified.timestamp() + 60)
+        Post.objects.create(text='Ещё пост', author=self.post.author)
+        self.assertEqual(
+            self.guest.get(url, HTTP_IF_MODIFIED_SINCE=since).status_code,
+            200)
+
+    def test_missing_objects_still_404(self):
+        """Для несуществующих страниц условный GET не мешает 404."""
+        for url in (reverse('posts:group_list', args=['missing']),
+                    reverse('posts:profile', args=['missing']),
+                    reverse('posts:post_detail', args=[10 ** 6])):
+            with self.subTest(url=url):
+                response = self.guest.get(url, HTTP_IF_NONE_MATCH='*')
+                self.assertEqual(response.status_code, 404)
@@ -0,0 +1,97 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import export
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='export_author')
+        cls.reader = User.objects.create_user(username='export_reader')
+        cls.staff = User.objects.create_user(username='export_staff',
+                                             is_staff=True)
+        cls.group = Group.objects.create(title='Выгрузка', slug='export')
+        Post.objects.bulk_create(
+            Post(author=cls.author, group=cls.group, text=f'Пост {number}')
+            for number in range(7))
+        Comment.objects.create(post=Post.objects.first(), author=cls.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def lines(self, data):
+        return [json.loads(line) for line in data.decode().splitlines()]
+
+    def test_chunks_are_limited_keyset_queries(self):
+        """Каждая пачка - запрос с LIMIT по pk, без OFFSET."""
+        with CaptureQueriesContext(connection) as queries:
+            lines = list(export.Export(chunk_size=3))
+        self.assertEqual(len(lines), 9)
+        # Постов 7: пачки 3, 3, 1; комментарий и подписка - по одной.
+        self.assertEqual(len(queries), 5)
+        for query in queries:
+            self.assertIn('LIMIT 3', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+
+    def test_view_is_staff_only(self):
+        """Выгрузка доступна только персоналу."""
+        url = reverse('posts:export')
+        self.client.force_login(self.reader)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+        self.client.force_login(self.staff)
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        lines = self.lines(b''.join(response.streaming_content))
+        self.assertEqual(
+            [line['model'] for line in lines],
+            ['posts.post'] * 7 + ['posts.comment', 'posts.follow'])
+
+    def test_view_gzip(self):
+        """?gzip=1 отдаёт тот же поток, сжатый gzip."""
+        self.client.force_login(self.staff)
+        plain = b''.join(
+            self.client.get(reverse('posts:export')).streaming_content)
+        response = self.client.get(reverse('posts:export'), {'gzip': '1'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        data = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(data, plain)
+
+    def test_round_trip_through_import(self):
+        """Выгрузку без изменений загружает import_posts."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'export.ndjson.gz')
+        call_command('export_posts', path, '--gzip', '--chunk-size=4',
+                     stderr=io.StringIO())
+        fields = ('pk', 'text', 'author', 'group', 'pub_date')
+        posts = list(Post.objects.order_by('pk').values_list(*fields))
+        comments = list(Comment.objects.values_list('pk', 'post', 'created'))
+        Follow.objects.all().delete()
+        Post.objects.all().delete()
+        call_command('import_posts', path, stdout=io.StringIO())
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list(*fields)), posts)
+        self.assertEqual(
+            list(Comment.objects.values_list('pk', 'post', 'created')),
+            comments)
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.author).exists())
@@ -0,0 +1,129 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import feeds
+from posts.models import FeedItem, Follow, Post
+
+User = get_user_model()
+
+
+class FollowFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Feed_Author')
+        cls.reader = User.objects.create_user(username='Feed_Reader')
+        cls.old_post = Post.objects.create(text='Старый пост',
+                                           author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed_ids(self):
+        return set(FeedItem.objects.filter(user=self.reader)
+                   .values_list('post_id', flat=True))
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка заполняет ленту, отписка её очищает."""
+        self.client.get(reverse('posts:profile_follow',
+                                args=[self.author.username]))
+        self.assertEqual(self.feed_ids(), {self.old_post.pk})
+        self.client.get(reverse('posts:profile_unfollow',
+                                args=[self.author.username]))
+        self.assertEqual(self.feed_ids(), set())
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленты всех подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertIn(post.pk, self.feed_ids())
+
+    def test_follow_index_reads_feed_without_follow_join(self):
+        """follow_index читает ленту без join с Follow."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']),
+                         [self.old_post])
+        for query in queries.captured_queries:
+            self.assertNotIn('posts_follow', query['sql'])
+
+    def test_rebuild_command_restores_feed(self):
+        """rebuild_feeds восстанавливает ленту по подпискам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        FeedItem.objects.all().delete()
+        call_command('rebuild_feeds', stdout=StringIO())
+        self.assertEqual(self.feed_ids(), {self.old_post.pk})
+
+
+@override_settings(FEED_PULL_THRESHOLD=2)
+class HybridFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.star = User.objects.create_user(username='Star')
+        cls.author = User.objects.create_user(username='Regular')
+        cls.reader = User.objects.create_user(username='Reader')
+        fan = User.objects.create_user(username='Fan')
+        Follow.objects.create(user=cls.reader, author=cls.star)
+        Follow.objects.create(user=fan, author=cls.star)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_star_posts_are_pulled_not_pushed(self):
+        """Посты автора над порогом не раскладываются, но видны в ленте."""
+        posts = [
+            Post.objects.create(text=f'Пост {i}',
+                                author=self.star if i % 2 else self.author)
+            for i in range(15)
+        ]
+        self.assertFalse(
+            FeedItem.objects.filter(author=self.star).exists())
+        first = self.client.get(reverse('posts:follow_index'))
+        paginator = first.context['page_obj'].paginator
+        second = self.client.get(reverse('posts:follow_index'),
+                                 {'cursor': paginator.next_cursor})
+        shown = (list(first.context['page_obj'])
+                 + list(second.context['page_obj']))
+        self.assertEqual(shown, posts[::-1])
+
+    def test_metrics_split_authors_by_path(self):
+        """Метрики показывают число авторов на push и pull."""
+        stats = feeds.metrics()
+        self.assertEqual(stats['push_authors'], 1)
+        self.assertEqual(stats['pull_authors'], 1)
+
+    @override_settings(FEED_MAX_PAGE=2)
+    def test_deep_numbered_page_is_capped(self):
+        """?page=N глубже FEED_MAX_PAGE отдаёт последнюю разрешённую
+        страницу без ссылки дальше."""
+        for i in range(30):
+            Post.objects.create(text=f'Пост {i}', author=self.star)
+        response = self.client.get(reverse('posts:follow_index'),
+                                   {'page': 100000})
+        page = response.context['page_obj']
+        self.assertEqual(page.number, 2)
+        self.assertFalse(page.has_next())
+
+    def test_author_below_threshold_backfills_pulled_posts(self):
+        """Автор, потерявший подписчика ниже порога, раскладывает в ленты
+        посты, написанные на pull-пути."""
+        post = Post.objects.create(text='Пост звезды', author=self.star)
+        feeds.pulled_authors()
+        Follow.objects.filter(author=self.star).exclude(
+            user=self.reader).delete()
+        self.assertTrue(FeedItem.objects.filter(
+            user=self.reader, post=post).exists())
+        fresh = Post.objects.create(text='Уже push', author=self.star)
+        self.assertTrue(FeedItem.objects.filter(
+            user=self.reader, post=fresh).exists())
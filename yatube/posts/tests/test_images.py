@@ -0,0 +1,208 @@
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts.forms import PostForm
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+ORIENTATION = 0x0112
+GPS_INFO = 0x8825
+
+
+def make_jpeg(size, orientation=None, name='photo.jpg'):
+    image = Image.new('RGB', size, 'white')
+    # Левая четверть красная: по ней видно, что картинку повернули.
+    image.paste('red', (0, 0, size[0] // 4, size[1]))
+    exif = Image.Exif()
+    exif[GPS_INFO] = {1: 'N', 2: (55.0, 45.0, 0.0)}
+    if orientation:
+        exif[ORIENTATION] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type='image/jpeg')
+
+
+def make_animation(image_format, size=(400, 200), frames=3):
+    images = [Image.new('RGB', size, color)
+              for color in ('red', 'green', 'blue')[:frames]]
+    options = {}
+    if image_format != 'GIF':
+        exif = Image.Exif()
+        exif[GPS_INFO] = {1: 'N', 2: (55.0, 45.0, 0.0)}
+        options['exif'] = exif
+    buffer = io.BytesIO()
+    images[0].save(buffer, image_format, save_all=True,
+                   append_images=images[1:], duration=100, loop=0,
+                   **options)
+    name = f'animation.{image_format.lower()}'
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type=f'image/{image_format.lower()}')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, IMAGE_MAX_SIDE=100,
+                   IMAGE_MAX_PIXELS=1000 * 1000)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Image_Author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def clean(self, upload):
+        form = PostForm({'text': 'Текст'}, {'image': upload})
+        form.is_valid()
+        return form
+
+    def test_large_image_downscaled_and_stripped(self):
+        """Большая картинка уменьшается, EXIF удаляется, поворот
+        применяется к пикселям."""
+        form = self.clean(make_jpeg((400, 200), orientation=6))
+        self.assertTrue(form.is_valid(), form.errors)
+        with Image.open(form.cleaned_data['image']) as image:
+            self.assertEqual(image.size, (50, 100))
+            self.assertFalse(image.getexif())
+            # После поворота на 90° красная полоса оказалась сверху.
+            red, green, _ = image.convert('RGB').getpixel((25, 5))
+            self.assertGreater(red, 200)
+            self.assertLess(green, 100)
+
+    def test_too_many_pixels_rejected(self):
+        """Картинка сверх IMAGE_MAX_PIXELS отклоняется."""
+        form = self.clean(make_jpeg((1100, 1000)))
+        self.assertIn('image', form.errors)
+
+    @override_settings(IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_file_size_limit(self):
+        """Файл больше IMAGE_MAX_UPLOAD_SIZE отклоняется."""
+        form = self.clean(make_jpeg((50, 50)))
+        self.assertIn('image', form.errors)
+
+    def test_upload_saved_without_metadata(self):
+        """post_create сохраняет уже перезаписанную картинку."""
+        client = Client()
+        client.force_login(self.author)
+        client.post(reverse('posts:post_create'),
+                    {'text': 'С фото', 'image': make_jpeg((300, 300))})
+        post = Post.objects.get(text='С фото')
+        with Image.open(post.image) as image:
+            self.assertEqual(image.size, (100, 100))
+            self.assertFalse(image.getexif())
+
+    def test_animation_downscaled_and_stripped(self):
+        """Анимация GIF, WebP и APNG перезаписывается покадрово: кадры
+        уменьшены, EXIF удалён, анимация сохранена."""
+        for image_format in ('GIF', 'WEBP', 'PNG'):
+            with self.subTest(image_format=image_format):
+                form = self.clean(make_animation(image_format))
+                self.assertTrue(form.is_valid(), form.errors)
+                with Image.open(form.cleaned_data['image']) as image:
+                    self.assertEqual(image.format, image_format)
+                    self.assertEqual(image.n_frames, 3)
+                    self.assertEqual(image.size, (100, 50))
+                    self.assertFalse(image.getexif())
+
+    def test_animation_pixels_counted_over_all_frames(self):
+        """Лимит IMAGE_MAX_PIXELS считается по всем кадрам анимации."""
+        form = self.clean(make_animation('GIF', size=(800, 500)))
+        self.assertIn('image', form.errors)
+
+    def test_not_drafted_formats_have_lower_limit(self):
+        """PNG декодируется целиком: для него лимит
+        IMAGE_MAX_DECODED_PIXELS, для JPEG - IMAGE_MAX_PIXELS."""
+        buffer = io.BytesIO()
+        Image.new('RGB', (600, 500)).save(buffer, 'PNG')
+        with self.settings(IMAGE_MAX_DECODED_PIXELS=200_000):
+            form = self.clean(SimpleUploadedFile(
+                'big.png', buffer.getvalue(), content_type='image/png'))
+            self.assertIn('image', form.errors)
+            self.assertTrue(self.clean(make_jpeg((600, 500))).is_valid())
+
+
+# Загрузка обрабатывается в отдельном процессе с настройками сайта:
+# пик RSS процесса видит и память Pillow под пиксели, которую
+# tracemalloc не считает.
+PEAK_SCRIPT = """
+import json, os, resource, sys
+import django
+django.setup()
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from posts import images
+
+path = sys.argv[1]
+error = None
+with open(path, 'rb') as stream:
+    upload = UploadedFile(stream, os.path.basename(path), 'image/x',
+                          os.path.getsize(path))
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    try:
+        images.process(upload)
+    except ValidationError as exc:
+        error = exc.code
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'error': error, 'peak': after - before}))
+"""
+# На загрузку не больше стольких мегабайт, каким бы ни был файл.
+PEAK_LIMIT_MB = 128
+
+
+def upload_peak(path):
+    """Прирост пика RSS (МБ) и код ошибки при обработке файла."""
+    env = {**os.environ, 'PYTHONPATH': str(settings.BASE_DIR),
+           'DJANGO_SETTINGS_MODULE': 'yatube.settings'}
+    output = subprocess.run(
+        [sys.executable, '-c', PEAK_SCRIPT, path], env=env, check=True,
+        stdout=subprocess.PIPE, universal_newlines=True).stdout
+    result = json.loads(output)
+    # ru_maxrss в килобайтах, на macOS - в байтах.
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return result['peak'] / scale, result['error']
+
+
+class ImagePeakMemoryTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        gradient = Image.linear_gradient('L')
+        for name, image_format, size in (
+                ('large.jpg', 'JPEG', (7000, 7000)),
+                ('large.png', 'PNG', (4000, 3000)),
+                ('huge.png', 'PNG', (7000, 7000))):
+            gradient.resize(size).convert('RGB').save(
+                os.path.join(cls.directory, name), image_format)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_peak_memory_bounded(self):
+        """JPEG 49 Мп декодируется через draft, PNG до лимита - целиком,
+        PNG больше лимита отклоняется по заголовку: пик памяти не
+        больше PEAK_LIMIT_MB в любом случае."""
+        for name, error in (('large.jpg', None), ('large.png', None),
+                            ('huge.png', 'too_many_pixels')):
+            with self.subTest(name=name):
+                peak, code = upload_peak(os.path.join(self.directory, name))
+                self.assertEqual(code, error)
+                self.assertLess(peak, PEAK_LIMIT_MB)
@@ -0,0 +1,109 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import search
+from posts.management.commands.import_posts import read_array
+from posts.models import Comment, FeedItem, Follow, Group, Post, PostTag
+
+User = get_user_model()
+
+DUMP = [
+    {'model': 'posts.group', 'pk': 7,
+     'fields': {'title': 'Импорт', 'slug': 'import', 'description': ''}},
+    {'model': 'contenttypes.contenttype', 'pk': 1,
+     'fields': {'app_label': 'posts', 'model': 'post'}},
+    {'model': 'auth.user', 'pk': 40,
+     'fields': {'username': 'imported_author', 'password': '!',
+                'date_joined': '2020-01-01T00:00:00Z',
+                'groups': [1], 'user_permissions': []}},
+    {'model': 'auth.user', 'pk': 41,
+     'fields': {'username': 'imported_reader', 'password': '!',
+                'date_joined': '2020-01-01T00:00:00Z'}},
+    {'model': 'posts.follow', 'pk': 3,
+     'fields': {'user': 41, 'author': 40}},
+    {'model': 'posts.post', 'pk': 100,
+     'fields': {'text': 'Дневник #старое', 'author': 40, 'group': 7,
+                'pub_date': '1854-03-14T00:00:00Z', 'image': ''}},
+    {'model': 'posts.post', 'pk': 101,
+     'fields': {'text': 'Второй пост', 'author': 40, 'group': None,
+                'pub_date': '1854-03-15T00:00:00Z', 'image': ''}},
+    {'model': 'posts.comment', 'pk': 5,
+     'fields': {'post': 100, 'author': 41, 'text': 'Комментарий',
+                'created': '2022-03-05T08:24:45Z'}},
+]
+
+
+class ImportPostsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, text):
+        path = os.path.join(self.directory, name)
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(path, 'wt', encoding='utf-8') as stream:
+            stream.write(text)
+        return path
+
+    def run_import(self, path):
+        out = io.StringIO()
+        call_command('import_posts', path, batch_size=3, stdout=out)
+        return out.getvalue()
+
+    def assert_imported(self, output):
+        post = Post.objects.get(pk=100)
+        self.assertEqual(post.pub_date,
+                         datetime(1854, 3, 14, tzinfo=timezone.utc))
+        self.assertIsNotNone(post.modified)
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(User.objects.get(pk=40).stats.posts_count, 2)
+        self.assertEqual(Comment.objects.get().post_id, 100)
+        self.assertTrue(Follow.objects.filter(user_id=41, author_id=40))
+        self.assertEqual(Group.objects.get().posts.count(), 1)
+        self.assertEqual(FeedItem.objects.filter(user_id=41).count(), 2)
+        self.assertEqual(
+            list(PostTag.objects.values_list('tag__name', 'post_id')),
+            [('старое', 100)])
+        self.assertIn('Загружено строк: 7', output)
+        self.assertIn('Пропущено объектов других моделей: 1', output)
+        self.assertIn('Пользователей без перенесённых групп и прав: 1',
+                      output)
+
+    def test_fixture_array(self):
+        """Дамп dumpdata загружается с датами из дампа и пересобранными
+        счётчиками, лентами и хештегами."""
+        output = self.run_import(self.write('dump.json', json.dumps(DUMP)))
+        self.assert_imported(output)
+        # Новые посты получают id после загруженных, а поисковый индекс
+        # снова следит за таблицей.
+        post = Post.objects.create(text='Новый дневник', author_id=40)
+        self.assertGreater(post.pk, 101)
+        if search.available():
+            paginator = search.SearchPaginator(search.match_query('дневник'),
+                                               10)
+            self.assertEqual(
+                sorted(post.pk for post in paginator.get_cursor_page()),
+                [100, post.pk])
+
+    def test_ndjson_gzip(self):
+        """NDJSON, в том числе сжатый gzip, читается построчно."""
+        text = '\n'.join(json.dumps(obj) for obj in DUMP)
+        self.assert_imported(self.run_import(self.write('dump.ndjson.gz',
+                                                        text)))
+
+    def test_read_array_across_chunks(self):
+        """Объекты, разрезанные границей куска, собираются целиком."""
+        text = ' [\n' + ',\n'.join(json.dumps(obj) for obj in DUMP) + ']\n'
+        self.assertEqual(list(read_array(io.StringIO(text), chunk_size=7)),
+                         DUMP)
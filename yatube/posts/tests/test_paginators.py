@@ -0,0 +1,94 @@
+import base64
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+from posts.paginators import CursorPaginator
+
+User = get_user_model()
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='Cursor_User')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.user) for i in range(25))
+        # Одинаковая дата у всех постов: порядок держится только на id.
+        first = Post.objects.order_by('pk').first()
+        Post.objects.update(pub_date=first.pub_date)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def walk(self, paginator_factory):
+        pages, cursor = [], None
+        while True:
+            paginator = paginator_factory()
+            page = paginator.get_cursor_page(cursor)
+            pages.append([post.pk for post in page])
+            if not paginator.has_next:
+                return pages
+            cursor = paginator.next_cursor
+
+    def test_walk_covers_feed_once(self):
+        """Обход по курсорам отдаёт каждый пост ровно один раз по порядку."""
+        pages = self.walk(lambda: CursorPaginator(Post.objects.all(), 10))
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        ids = [pk for page in pages for pk in page]
+        self.assertEqual(
+            ids, list(Post.objects.order_by('-pub_date', '-pk')
+                      .values_list('pk', flat=True)))
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Курсор назад возвращает предыдущую страницу целиком."""
+        first = CursorPaginator(Post.objects.all(), 10)
+        first_ids = [post.pk for post in first.get_cursor_page()]
+        second = CursorPaginator(Post.objects.all(), 10)
+        second.get_cursor_page(first.next_cursor)
+        back = CursorPaginator(Post.objects.all(), 10)
+        back_ids = [post.pk for post in
+                    back.get_cursor_page(second.previous_cursor)]
+        self.assertEqual(back_ids, first_ids)
+        self.assertFalse(back.has_previous)
+
+    def test_cursor_page_has_no_count_or_offset(self):
+        """Страница по курсору обходится без COUNT и OFFSET."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        paginator.get_cursor_page()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('posts:index'), {'cursor': paginator.next_cursor})
+        self.assertEqual(len(response.context['page_obj']), 10)
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+            self.assertNotIn('OFFSET', query['sql'].upper())
+
+    def test_invalid_cursor_gives_first_page(self):
+        """Битый курсор отдаёт первую страницу."""
+        response = self.client.get(reverse('posts:index'),
+                                   {'cursor': 'не-курсор'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['page_obj'].paginator.has_previous)
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_cursor_with_huge_integer_gives_first_page(self):
+        """Число вне 64 бит в курсоре - битый курсор, а не ошибка базы."""
+        payload = json.dumps(['next', '2020-01-01T00:00:00+00:00', 10 ** 30])
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        response = self.client.get(reverse('posts:index'), {'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['page_obj'].paginator.has_previous)
+
+    def test_page_number_fallback(self):
+        """Старые ссылки ?page=N продолжают работать."""
+        response = self.client.get(reverse('posts:index'), {'page': 3})
+        self.assertEqual(response.context['page_obj'].number, 3)
+        self.assertEqual(len(response.context['page_obj']), 5)
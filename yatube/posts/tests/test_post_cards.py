@@ -0,0 +1,73 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core import generations
+from posts.models import Comment, Group, Post
+
+User = get_user_model()
+
+RENDER = 'posts.templatetags.post_cards.render_to_string'
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Card_Author')
+        cls.group = Group.objects.create(title='Группа', slug='cards',
+                                         description='Описание')
+        cls.posts = [
+            Post.objects.create(text=f'Карточка {i}', author=cls.user,
+                                group=cls.group)
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def render_index(self):
+        # Внешний фрагмент ленты сбрасываем, чтобы собирать её из карточек.
+        generations.bump('posts')
+        with mock.patch(RENDER, wraps=render_to_string) as render:
+            response = self.client.get(reverse('posts:index'))
+        return response, render.call_count
+
+    def test_cards_rendered_once(self):
+        """Карточка рендерится один раз и дальше берётся из кэша."""
+        _, first = self.render_index()
+        _, second = self.render_index()
+        self.assertEqual(first, 3)
+        self.assertEqual(second, 0)
+
+    def test_only_changed_card_rerendered(self):
+        """Изменённый пост и новый комментарий перерисовывают одну карточку."""
+        self.render_index()
+        post = self.posts[0]
+        post.text = 'Новый текст'
+        post.save()
+        response, rendered = self.render_index()
+        self.assertEqual(rendered, 1)
+        self.assertContains(response, 'Новый текст')
+        Comment.objects.create(post=self.posts[1], author=self.user,
+                               text='Комментарий')
+        response, rendered = self.render_index()
+        self.assertEqual(rendered, 1)
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_cards_shared_across_feeds(self):
+        """Ленты index, group и profile собираются из карточек."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                for post in self.posts:
+                    self.assertContains(response, post.text)
@@ -0,0 +1,93 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from core import queries
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class QueryBudgetTests(TestCase):
+    """Страницы держатся в бюджетах @query_budget на полной странице
+    постов разных авторов и групп: QueryBudgetMiddleware роняет запрос,
+    если бюджет превышен или запрос повторяется на каждую строку."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='budget_reader')
+        cls.authors = []
+        for number in range(12):
+            author = User.objects.create_user(
+                username=f'budget_author{number}', first_name='Имя',
+                last_name=f'Фамилия{number}')
+            group = Group.objects.create(title=f'Группа {number}',
+                                         slug=f'budget-{number}')
+            cls.post = Post.objects.create(
+                author=author, group=group, text=f'#бюджет пост {number}')
+            Follow.objects.create(user=cls.reader, author=author)
+            cls.authors.append(author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_pages_within_budget(self):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=2',
+            reverse('posts:group_list', args=['budget-11']),
+            reverse('posts:profile', args=['budget_author11']),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:follow_index'),
+            reverse('posts:follow_index') + '?page=1',
+            reverse('posts:tag_posts', args=['бюджет']),
+            reverse('posts:search') + '?q=пост',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_post_detail_does_not_query_per_comment(self):
+        """Авторы комментариев читаются тем же запросом, что и
+        комментарии: число запросов не растёт с их числом."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        counts = []
+        for author in self.authors:
+            Comment.objects.create(post=self.post, author=author,
+                                   text='Комментарий')
+            cache.clear()
+            with queries.assert_budget() as log:
+                self.client.get(url)
+            counts.append(len(log))
+        self.assertEqual(len(set(counts)), 1, counts)
+
+    def test_writes_within_budget(self):
+        response = self.client.post(
+            reverse('posts:post_create'),
+            {'text': '#новый #тег', 'group': self.post.group_id})
+        self.assertEqual(response.status_code, 302)
+        response = self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Комментарий'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_post_create_fans_out_to_many_followers(self):
+        """Раскладка в ленты тысячи с лишним подписчиков - пачки
+        INSERT, ограниченные FEED_PULL_THRESHOLD, а не N+1."""
+        author = self.authors[0]
+        User.objects.bulk_create(
+            User(username=f'budget_follower{number}')
+            for number in range(2000))
+        Follow.objects.bulk_create(
+            Follow(user_id=user_id, author=author) for user_id in
+            User.objects.filter(username__startswith='budget_follower')
+            .values_list('pk', flat=True))
+        self.client.force_login(author)
+        response = self.client.post(reverse('posts:post_create'),
+                                    {'text': 'Пост для всех'})
+        self.assertEqual(response.status_code, 302)
+        post = Post.objects.latest('pk')
+        self.assertEqual(post.feed_items.count(), 2001)
@@ -0,0 +1,133 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?(?P<table>\w+)( AS \w+)?$')
+TEMP_SORT = 'USE TEMP B-TREE'
+# Шаги плана, которые допустимы в админке, и запросы, в которых они
+# допустимы: справочник групп для list_editable читается целиком, строки
+# страницы дочитываются по id и сортируются (их не больше list_per_page),
+# счёт с фильтром ограничен LIMIT.
+ADMIN_ALLOWED = {
+    'SCAN posts_group': re.compile(r'^SELECT [^()]* FROM "posts_group"$'),
+    'USE TEMP B-TREE FOR ORDER BY': re.compile(r'"posts_\w+"\."id" IN \('),
+    'SCAN subquery': re.compile(r'^SELECT COUNT\(\*\) FROM \(SELECT '),
+}
+# Основной запрос списка: ключи страницы по индексу даты.
+ADMIN_KEYS = re.compile(
+    r'^SELECT "posts_\w+"\."id", "posts_\w+"\."\w+" FROM "posts_\w+" '
+    r'.*ORDER BY .* LIMIT \d+$')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть в SQLite')
+class QueryPlanTests(TestCase):
+    """Запросы лент обходятся индексами: без полного скана таблиц
+    и без сортировки во временном B-дереве."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Planned')
+        cls.reader = User.objects.create_user(username='Plan_Reader')
+        cls.group = Group.objects.create(title='Группа', slug='plans',
+                                         description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(12):
+            cls.post = Post.objects.create(text=f'Пост {i} #план',
+                                           author=cls.author,
+                                           group=cls.group)
+        Comment.objects.create(post=cls.post, author=cls.reader,
+                               text='Комментарий')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_indexed(self, url, params=None, allowed=None):
+        """allowed: {шаг плана: шаблон запросов, где он допустим}."""
+        allowed = allowed or {}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.queries = [query['sql'] for query in queries.captured_queries]
+        for sql in self.queries:
+            if not sql.startswith('SELECT'):
+                continue
+            for step in self.explain(sql):
+                if step in allowed and allowed[step].search(sql):
+                    continue
+                with self.subTest(url=url, params=params, sql=sql):
+                    self.assertIsNone(FULL_SCAN.match(step), step)
+                    self.assertNotIn(TEMP_SORT, step)
+        return response
+
+    def test_feed_queries_use_indexes(self):
+        """Ленты и их номерные страницы используют индексы."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            response = self.assert_indexed(url)
+            paginator = response.context['page_obj'].paginator
+            self.assert_indexed(url, {'cursor': paginator.next_cursor})
+            self.assert_indexed(url, {'page': 2})
+
+    def test_tag_feed_queries_use_indexes(self):
+        """Лента хештега читается по индексу (tag, pub_date)."""
+        url = reverse('posts:tag_posts', args=['план'])
+        response = self.assert_indexed(url)
+        paginator = response.context['page_obj'].paginator
+        self.assert_indexed(url, {'cursor': paginator.next_cursor})
+
+    def test_admin_changelists_use_indexes(self):
+        """Списки админки, их курсорные страницы и date_hierarchy
+        используют индексы."""
+        self.client.force_login(User.objects.create_superuser(
+            'Plan_Admin', 'admin@example.com', 'password'))
+        for name in ('post', 'comment'):
+            url = reverse(f'admin:posts_{name}_changelist')
+            response = self.assert_indexed(url, allowed=ADMIN_ALLOWED)
+            self.assert_keys_sorted_by_index(name)
+            field = response.context['cl'].date_hierarchy
+            self.assert_indexed(
+                url, {f'{field}__year': self.post.pub_date.year},
+                allowed=ADMIN_ALLOWED)
+            self.assert_keys_sorted_by_index(name)
+
+    def assert_keys_sorted_by_index(self, name):
+        keys = [sql for sql in self.queries if ADMIN_KEYS.match(sql)
+                and f'FROM "posts_{name}"' in sql]
+        self.assertEqual(len(keys), 1, self.queries)
+        for step in self.explain(keys[0]):
+            self.assertNotIn(TEMP_SORT, step)
+
+    def test_autocomplete_uses_indexes(self):
+        """Подсказки ищут префикс диапазоном по индексу."""
+        self.reader.is_staff = True
+        self.reader.save()
+        for kind in ('groups', 'users'):
+            self.assert_indexed(reverse('posts:autocomplete', args=[kind]),
+                                {'term': 'пл'})
+
+    def test_post_detail_queries_use_indexes(self):
+        """Страница поста и её комментарии используют индексы."""
+        self.assert_indexed(reverse('posts:post_detail',
+                                    args=[self.post.pk]))
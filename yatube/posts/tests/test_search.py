@@ -0,0 +1,104 @@
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import search
+from posts.models import Post
+
+User = get_user_model()
+
+
+@skipUnless(search.available(), 'FTS5 есть только в SQLite')
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='Searcher')
+        cls.cat = Post.objects.create(text='Котик спит на диване',
+                                      author=cls.user)
+        cls.dog = Post.objects.create(text='Собака гуляет во дворе',
+                                      author=cls.user)
+        Post.objects.bulk_create(
+            Post(text=f'Ёлка номер {i} и ещё одна ёлка', author=cls.user)
+            for i in range(15))
+        cls.many = set(Post.objects.filter(text__startswith='Ёлка')
+                       .values_list('pk', flat=True))
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def found(self, text, cursor=None):
+        params = {'q': text}
+        if cursor:
+            params['cursor'] = cursor
+        response = self.client.get(reverse('posts:search'), params)
+        return response, [post.pk for post in response.context['page_obj']]
+
+    def test_russian_word_forms(self):
+        """Поиск находит другие формы слова и не зависит от регистра и ё."""
+        for text in ('котики', 'КОТИКА', 'диване'):
+            with self.subTest(text=text):
+                self.assertEqual(self.found(text)[1], [self.cat.pk])
+        self.assertEqual(len(self.found('елки')[1]), 10)
+        self.assertEqual(self.found('собака котик')[1], [])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при правке, bulk-обновлении и удалении."""
+        self.dog.text = 'Кошка во дворе'
+        self.dog.save()
+        self.assertEqual(self.found('собака')[1], [])
+        self.assertEqual(self.found('кошка')[1], [self.dog.pk])
+        Post.objects.filter(pk=self.dog.pk).update(text='Попугай')
+        self.assertEqual(self.found('попугай')[1], [self.dog.pk])
+        self.dog.delete()
+        self.assertEqual(self.found('попугай')[1], [])
+
+    def test_cursor_pages_keep_query_and_rank(self):
+        """Страницы результатов идут по курсору, сохраняя запрос."""
+        response, first = self.found('ёлка')
+        paginator = response.context['page_obj'].paginator
+        self.assertContains(response, 'q=%D1%91%D0%BB%D0%BA%D0%B0&amp;cursor=')
+        _, second = self.found('ёлка', paginator.next_cursor)
+        self.assertEqual(len(first), 10)
+        self.assertEqual(len(second), 5)
+        self.assertEqual(set(first) | set(second), self.many)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через индекс, без LIKE."""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('admin:posts_post_changelist'), {'q': 'котик'})
+        self.assertContains(response, 'Котик спит')
+        self.assertNotContains(response, 'Собака гуляет')
+        for query in queries.captured_queries:
+            self.assertNotIn('LIKE', query['sql'])
+
+
+class FallbackSearchTests(TestCase):
+    """Поиск без FTS5 (icontains) и его номерные страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='Fallback')
+        Post.objects.bulk_create(
+            Post(text=f'Поиск {i}', author=user) for i in range(12))
+        Post.objects.create(text='Посторонний пост', author=user)
+
+    def test_numbered_pages_keep_query(self):
+        """Ссылки ?page= ведут на страницы того же поиска."""
+        with mock.patch.object(search, 'available', return_value=False):
+            response = self.client.get(reverse('posts:search'),
+                                       {'q': 'Поиск', 'page': 1})
+            self.assertContains(
+                response, '?q=%D0%9F%D0%BE%D0%B8%D1%81%D0%BA&amp;page=2')
+            response = self.client.get(reverse('posts:search'),
+                                       {'q': 'Поиск', 'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 2)
+        self.assertNotContains(response, 'Посторонний пост')
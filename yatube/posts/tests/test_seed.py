@@ -0,0 +1,86 @@
+import io
+import statistics
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from posts import search
+from posts.management.commands import seed_data
+from posts.models import Comment, FeedItem, Follow, Post, UserStats
+
+SIZES = {'users': 60, 'groups': 4, 'posts': 300, 'comments': 120,
+         'follows': 5}
+
+
+@mock.patch.object(seed_data, 'BLOCK', 70)
+class SeedDataTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def seed(self, **options):
+        call_command('seed_data', stdout=io.StringIO(),
+                     **{**SIZES, **options})
+
+    def snapshot(self):
+        return (
+            list(Post.objects.order_by('pk').values_list(
+                'text', 'author__username', 'group__slug', 'pub_date')),
+            list(Comment.objects.order_by('pk').values_list(
+                'post__text', 'author__username', 'created')),
+            sorted(Follow.objects.values_list(
+                'user__username', 'author__username')),
+        )
+
+    def test_sizes_and_derived_data(self):
+        """Создаются заданные объёмы, счётчики и ленты пересобраны."""
+        self.seed()
+        self.assertEqual(Post.objects.count(), SIZES['posts'])
+        self.assertEqual(Comment.objects.count(), SIZES['comments'])
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(FeedItem.objects.exists())
+        stats = UserStats.objects.order_by('-posts_count').first()
+        self.assertEqual(stats.posts_count,
+                         Post.objects.filter(author=stats.user_id).count())
+        for comment in Comment.objects.select_related('post')[:20]:
+            self.assertGreater(comment.created, comment.post.pub_date)
+
+    def test_heavy_tails(self):
+        """Немного популярных авторов и много пользователей без постов."""
+        self.seed()
+        stats = UserStats.objects.all()
+        followers = sorted(stats.values_list('followers_count', flat=True))
+        self.assertGreater(followers[-1],
+                           5 * statistics.median(followers) + 5)
+        lurkers = stats.filter(posts_count=0).count()
+        self.assertGreater(lurkers, SIZES['users'] / 2)
+
+    def test_resume_gives_same_data(self):
+        """Прерванная генерация продолжается и даёт те же данные,
+        что и запуск с нуля."""
+        self.seed()
+        expected = self.snapshot()
+        # Как будто запуск оборвался посреди постов: подписок
+        # и комментариев ещё нет.
+        Comment.objects.all().delete()
+        Follow.objects.all().delete()
+        Post.objects.filter(
+            pk__gt=Post.objects.order_by('pk')[99].pk).delete()
+        self.seed()
+        self.assertEqual(self.snapshot(), expected)
+        self.seed()
+        self.assertEqual(Post.objects.count(), SIZES['posts'])
+
+    def test_interrupted_run_restores_search_triggers(self):
+        """Оборвавшийся запуск возвращает триггеры поиска: новые посты
+        по-прежнему попадают в индекс."""
+        with connection.cursor() as cursor:
+            expected = search._objects(cursor)
+        with mock.patch.object(seed_data.Command, 'comments',
+                               side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                self.seed()
+        with connection.cursor() as cursor:
+            self.assertEqual(search._objects(cursor), expected)
@@ -0,0 +1,113 @@
+import io
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from core.models import Blob
+from core.storage import is_content_name
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class StorageTestMixin:
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create(self, content, name='picture.png'):
+        return Post.objects.create(text='Пост', author=self.author,
+                                   image=ContentFile(content, name))
+
+    def refs(self, name):
+        return Blob.objects.get(name=name).refs
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(StorageTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Storage_Author')
+
+    def test_same_content_stored_once(self):
+        """Одинаковые загрузки дают один файл в шардированном каталоге."""
+        first = self.create(b'one', 'first.PNG')
+        second = self.create(b'one', 'second.png')
+        other = self.create(b'two')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertTrue(is_content_name(first.image.name))
+        self.assertRegex(first.image.name, r'^posts/\w\w/\w\w/\w{64}\.png$')
+        self.assertEqual(self.refs(first.image.name), 2)
+
+    def test_migrate_images(self):
+        """migrate_images переносит старые файлы и объединяет дубликаты."""
+        legacy = FileSystemStorage()
+        names = [legacy.save('posts/old.png', ContentFile(b'same'))
+                 for _ in range(2)]
+        posts = [Post.objects.create(text='Старый', author=self.author)
+                 for _ in names]
+        for post, name in zip(posts, names):
+            Post.objects.filter(pk=post.pk).update(image=name)
+        call_command('migrate_images', stdout=io.StringIO())
+        new_names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(new_names), 1)
+        new_name = new_names.pop()
+        self.assertTrue(is_content_name(new_name))
+        self.assertEqual(self.refs(new_name), 2)
+        for name in names:
+            self.assertFalse(os.path.exists(legacy.path(name)))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class StorageCommitTests(StorageTestMixin, TransactionTestCase):
+    """Файлы удаляются после коммита: нужны настоящие транзакции."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='Commit_Author')
+
+    def test_file_removed_with_last_reference(self):
+        """Файл удаляется с диска вместе с последней ссылкой."""
+        first = self.create(b'shared')
+        second = self.create(b'shared')
+        name = first.image.name
+        first.delete()
+        self.assertTrue(second.image.storage.exists(name))
+        self.assertEqual(self.refs(name), 1)
+        second.image = ContentFile(b'replacement', 'new.png')
+        second.save()
+        self.assertFalse(second.image.storage.exists(name))
+        self.assertFalse(Blob.objects.filter(name=name).exists())
+
+    def test_rollback_keeps_file(self):
+        """Откат транзакции с удалением поста оставляет файл и ссылку."""
+        post = self.create(b'kept')
+        name = post.image.name
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                post.delete()
+                raise RuntimeError
+        self.assertTrue(post.image.storage.exists(name))
+        self.assertEqual(self.refs(name), 1)
+
+    def test_reference_taken_before_commit_keeps_file(self):
+        """Если до коммита удаления файл снова загрузили, он остаётся."""
+        post = self.create(b'again')
+        name = post.image.name
+        with transaction.atomic():
+            post.delete()
+            again = self.create(b'again')
+        self.assertEqual(again.image.name, name)
+        self.assertTrue(again.image.storage.exists(name))
+        self.assertEqual(self.refs(name), 1)
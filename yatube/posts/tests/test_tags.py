@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import tags
+from posts.models import Post, PostTag, Tag
+
+User = get_user_model()
+
+
+class TagIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Tagger')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def indexed(self, post):
+        return set(PostTag.objects.filter(post=post)
+                   .values_list('tag__name', flat=True))
+
+    def test_extract(self):
+        """Хештег начинается с решётки в начале слова и приводится
+        к нижнему регистру; якоря в адресах не считаются."""
+        self.assertEqual(
+            tags.extract('#Ёлка и #кот_2, снова #КОТ_2; '
+                         'site.ru/page#anchor &#39; ##два'),
+            {'елка', 'кот_2'})
+
+    def test_index_follows_create_edit_delete(self):
+        """Индекс обновляется при создании, правке и удалении поста."""
+        post = Post.objects.create(text='#море и #солнце',
+                                   author=self.author)
+        self.assertEqual(self.indexed(post), {'море', 'солнце'})
+        post.text = '#море и #горы'
+        post.save()
+        self.assertEqual(self.indexed(post), {'море', 'горы'})
+        post.delete()
+        self.assertFalse(PostTag.objects.exists())
+
+    def test_tag_feed_pages(self):
+        """Лента хештега идёт от новых постов к старым и листается
+        курсором; страница читается фиксированным числом запросов."""
+        posts = [Post.objects.create(text=f'Пост {i} #лето',
+                                     author=self.author)
+                 for i in range(13)]
+        Post.objects.create(text='Без хештега', author=self.author)
+        url = reverse('posts:tag_posts', args=['Лето'])
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        page = response.context['page_obj']
+        self.assertEqual(list(page), posts[::-1][:10])
+        self.assertContains(response, '<a href="%s">#лето</a>' % reverse(
+            'posts:tag_posts', args=['лето']))
+        response = self.client.get(
+            url, {'cursor': page.paginator.next_cursor})
+        self.assertEqual(list(response.context['page_obj']),
+                         posts[::-1][10:])
+
+    def test_unknown_tag_not_found(self):
+        """Неизвестный хештег даёт 404."""
+        response = self.client.get(
+            reverse('posts:tag_posts', args=['нет_такого']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_rebuild(self):
+        """rebuild восстанавливает индекс по текстам постов."""
+        post = Post.objects.create(text='#один #два', author=self.author)
+        PostTag.objects.all().delete()
+        tags.rebuild()
+        self.assertEqual(self.indexed(post), {'один', 'два'})
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_linkify_escapes_text(self):
+        """linkify экранирует текст вокруг ссылок."""
+        html = tags.linkify('<b>#жирный</b>')
+        self.assertTrue(html.startswith('&lt;b&gt;<a href="/tags/'))
+        self.assertTrue(html.endswith('">#жирный</a>&lt;/b&gt;'))
@@ -0,0 +1,155 @@
+import io
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+
+from posts import thumbnails
+from posts.management.commands import warm_thumbnails
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='picture.png'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (40, 20), 'red').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type='image/png')
+
+
+def run_now(func):
+    func()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='Thumb_Author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def assert_rendered_without_decoding(self):
+        """Лента выводит миниатюру, не открывая исходную картинку."""
+        cache.clear()
+        with mock.patch('sorl.thumbnail.engines.pil_engine.Engine.get_image',
+                        side_effect=IOError) as get_image:
+            response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'class="card-img', count=1)
+        self.assertFalse(get_image.called)
+
+    def test_thumbnails_built_on_create(self):
+        """post_create строит миниатюры сразу после сохранения."""
+        with mock.patch('posts.thumbnails.transaction.on_commit', run_now):
+            self.client.post(reverse('posts:post_create'),
+                             {'text': 'С картинкой', 'image': make_image()})
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assert_rendered_without_decoding()
+
+    def test_warm_thumbnails_command(self):
+        """warm_thumbnails достраивает миниатюры уже загруженных картинок."""
+        Post.objects.create(text='Старый пост', author=self.author,
+                            image=make_image('old.png'))
+        call_command('warm_thumbnails', workers=1, stdout=io.StringIO())
+        self.assert_rendered_without_decoding()
+
+    def test_warm_thumbnails_submits_in_window(self):
+        """Задания уходят в пул окном: следующие пачки читаются по мере
+        готовности прошлых, а не все сразу."""
+        read = []
+
+        def batches():
+            for number in range(10):
+                read.append(number)
+                yield []
+
+        command = warm_thumbnails.Command()
+        with mock.patch.object(warm_thumbnails, 'connections'), \
+                ThreadPoolExecutor(max_workers=1) as pool:
+            results = command.submitted(pool, batches(), 2)
+            next(results)
+            self.assertLessEqual(len(read), 3)
+            self.assertEqual(len(list(results)), 9)
+
+    def test_feed_page_looks_up_thumbnails_in_one_query(self):
+        """Миниатюры страницы ищутся одним запросом к KV-хранилищу."""
+        for i in range(5):
+            Post.objects.create(text=f'Пост {i}', author=self.author,
+                                image=make_image(f'batch{i}.png'))
+        call_command('warm_thumbnails', workers=1, stdout=io.StringIO())
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        lookups = [query for query in queries.captured_queries
+                   if 'thumbnail_kvstore' in query['sql']]
+        self.assertEqual(len(lookups), 1)
+        for post in Post.objects.all():
+            for (width, _), geometry, options in thumbnails.VARIANTS:
+                url = get_thumbnail(post.image, geometry, **options).url
+                self.assertContains(response, f'{url} {width}w')
+
+    def test_variants_in_every_width_and_format(self):
+        """Для картинки строятся WebP и JPEG во всех ширинах."""
+        post = Post.objects.create(text='Пост', author=self.author,
+                                   image=make_image('wide.png'))
+        thumbnails.generate(post.image.name)
+        thumbnails.attach([post])
+        for (width, image_format), _, _ in thumbnails.VARIANTS:
+            with self.subTest(width=width, image_format=image_format):
+                file = post.thumbnail.files[width, image_format]
+                self.assertEqual(file.width, width)
+                with Image.open(file.storage.open(file.name)) as image:
+                    self.assertEqual(image.format, image_format)
+        self.assertTrue(post.thumbnail.fallback.url.endswith('.jpg'))
+
+    @override_settings(THUMBNAIL_BACKGROUND=True)
+    def test_missing_thumbnails_built_in_background(self):
+        """Страница без готовых миниатюр не декодирует картинку: она
+        выходит без неё и отдаёт картинку фоновому потоку один раз."""
+        post = Post.objects.create(text='Пост', author=self.author,
+                                   image=make_image('later.png'))
+        with mock.patch.object(thumbnails, '_submit') as submit, \
+                mock.patch('posts.thumbnails.get_thumbnail') as build:
+            thumbnails.attach([post])
+            response = self.client.get(reverse('posts:index'))
+        self.assertFalse(hasattr(post, 'thumbnail'))
+        self.assertNotContains(response, 'class="card-img')
+        self.assertFalse(build.called)
+        submit.assert_called_with(post.image.name)
+
+    def test_missing_source_tried_once(self):
+        """Картинка без исходника пробуется один раз и помечается: дальше
+        карточка выходит без неё, и её можно кэшировать."""
+        post = Post.objects.create(text='Пост', author=self.author,
+                                   image=make_image('gone.png'))
+        os.remove(post.image.path)
+        with self.assertLogs('posts.thumbnails', 'WARNING') as logs:
+            thumbnails.attach([post])
+            again = Post.objects.get(pk=post.pk)
+            thumbnails.attach([again])
+        self.assertEqual(len(logs.output), 1)
+        self.assertIsNone(again.thumbnail)
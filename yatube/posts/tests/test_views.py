@@ -101,6 +101,7 @@ class PostsPagesTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.user = User.objects.get(username="Test_User")
         self.authorized_client = Client()
@@ -207,13 +208,47 @@ class PostsPagesTests(TestCase):
 
     def test_cache_index_page(self):
         cache.clear()
+        # Первый показ строит миниатюры, и страница с ними - уже другая.
+        self.authorized_client.get(reverse('posts:index'))
         response = self.authorized_client.get(reverse('posts:index'))
         cached_response = response.content
-        post = Post.objects.get(pk=1)
-        post.delete()
+        # update() обходит сигналы: поколение не меняется, ответ из кэша.
+        Post.objects.filter(pk=1).update(text='Изменено мимо сигналов')
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(response.content, cached_response)
 
+    def test_cache_invalidated_on_change(self):
+        """Изменение поста или имени автора сразу сбрасывает кэш лент."""
+        pages = (
+            reverse(self.index_url[0]),
+            reverse(self.group_url[0], kwargs={'slug': self.group_url[2]}),
+            reverse(self.profile_url[0],
+                    kwargs={'username': self.profile_url[2]}),
+        )
+        for page in pages:
+            self.guest_client.get(page)
+        post = Post.objects.get(pk=13)
+        post.text = 'Свежий текст'
+        post.save()
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.guest_client.get(page)
+                self.assertContains(response, 'Свежий текст')
+        self.user.first_name = 'Переименован'
+        self.user.save()
+        response = self.guest_client.get(reverse(self.index_url[0]))
+        self.assertContains(response, 'Переименован')
+
+    def test_follow_page_cached_per_user(self):
+        """Кэш ленты подписок не смешивается с главной и между читателями."""
+        self.authorized_client.get(reverse('posts:index'))
+        response = self.authorized_follower.get(reverse('posts:follow_index'))
+        self.assertNotContains(response, 'Тестовый текст0')
+        self.authorized_follower.get(reverse('posts:profile_follow',
+                                     kwargs={'username': self.user}))
+        response = self.authorized_follower.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Тестовый текст0')
+
     def test_follow_author(self):
         before_follow_num = (Follow.objects.filter(author=self.user).count())
         self.authorized_follower.get(reverse('posts:profile_follow',
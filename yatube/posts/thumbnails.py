@@ -0,0 +1,243 @@
+"""Миниатюры картинок постов, которые готовятся заранее.
+
+Если миниатюра уже создана, sorl находит её в KV-хранилище и картинку
+не декодирует. Поэтому после сохранения поста миниатюры строятся
+в фоновом потоке, а старые картинки добирает команда warm_thumbnails.
+Поток один: sorl пишет KV-записи в ту же базу SQLite, что и запросы,
+а писатель у SQLite может быть только один. Страница, которой
+миниатюры не хватило, выводится без картинки и ставит её в тот же
+поток; картинка без исходника или битая помечается в кэше на
+FAILED_TIMEOUT, чтобы каждая страница не пробовала её заново.
+
+Каждая картинка режется в несколько ширин в WebP и JPEG; шаблоны
+выводят их через <picture> и srcset, и браузер скачивает самый
+маленький подходящий файл. Шаблоны не вызывают тег {% thumbnail %}
+на каждую карточку: attach() находит все миниатюры страницы одним
+get_many к кэшу sorl и одним запросом к его KV-таблице на промахи.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDBKVStore)
+from sorl.thumbnail.models import KVStore
+
+from core import queries
+
+from . import versions
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Геометрия и опции входят в ключ миниатюры в sorl: заранее строятся
+# ровно те варианты, которые показывают шаблоны.
+WIDTHS = (320, 640, 960)
+RATIO = 339 / 960
+FORMATS = ('WEBP', 'JPEG')
+VARIANTS = tuple(
+    ((width, image_format),
+     f'{width}x{round(width * RATIO)}',
+     {'crop': 'center', 'upscale': True, 'format': image_format})
+    for image_format in FORMATS for width in WIDTHS
+)
+
+# Сколько секунд не пробовать заново картинку, которая не построилась.
+FAILED_TIMEOUT = 60 * 60
+
+_lock = threading.Lock()
+_executor = None
+_slots = None
+# Картинки в очереди потока: одна и та же ставится один раз.
+_pending = set()
+
+
+def _source(name):
+    # Хранилище поля входит в ключ картинки в sorl: берём то же, что
+    # у Post.image, а не хранилище sorl по умолчанию.
+    return ImageFile(name, Post._meta.get_field('image').storage)
+
+
+def generate(name):
+    """Строит все варианты миниатюр для картинки из хранилища.
+    False, если исходника нет."""
+    source = _source(name)
+    if not source.exists():
+        return False
+    # sorl ходит в KV-таблицу по разу на вариант; это разовая работа
+    # после загрузки, а не запросы страницы.
+    with queries.unchecked():
+        for _, geometry, options in VARIANTS:
+            get_thumbnail(source, geometry, **options)
+    return True
+
+
+def _failed_key(name):
+    return f'thumbnails:failed:{name}'
+
+
+def _build(name):
+    # Разовая работа после загрузки: в бюджет страницы не входит, даже
+    # когда идёт в запросе (THUMBNAIL_BACKGROUND = False).
+    with queries.unchecked():
+        try:
+            built = generate(name)
+        except Exception:
+            logger.exception('Не удалось построить миниатюры для %s', name)
+            built = False
+        else:
+            if not built:
+                logger.warning('Нет исходника для миниатюр: %s', name)
+        if not built:
+            cache.set(_failed_key(name), True, FAILED_TIMEOUT)
+            return
+        # Страницы, показанные без картинки, получат новый ETag.
+        for author_id, group_id in Post.objects.filter(
+                image=name).values_list('author_id', 'group_id'):
+            versions.posts_changed(author_id, group_id)
+
+
+def _run(name):
+    try:
+        _build(name)
+    finally:
+        with _lock:
+            _pending.discard(name)
+        _slots.release()
+        close_old_connections()
+
+
+def _pool():
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='thumbnails')
+            _slots = threading.BoundedSemaphore(settings.THUMBNAIL_QUEUE_SIZE)
+    return _executor
+
+
+def _submit(name):
+    if not settings.THUMBNAIL_BACKGROUND:
+        _build(name)
+        return
+    pool = _pool()
+    with _lock:
+        if name in _pending:
+            return
+        # Очередь ограничена: при всплеске загрузок лишнее достроит
+        # следующий показ или warm_thumbnails, а память процесса не растёт.
+        if not _slots.acquire(blocking=False):
+            logger.warning('Очередь миниатюр заполнена, пропускаем %s', name)
+            return
+        _pending.add(name)
+    pool.submit(_run, name)
+
+
+def schedule(post):
+    """Ставит миниатюры поста в очередь после фиксации транзакции."""
+    if post.image:
+        name = post.image.name
+        transaction.on_commit(lambda: _submit(name))
+
+
+def _thumbnail_file(name, geometry, options):
+    # Повторяет нормализацию опций из ThumbnailBackend.get_thumbnail,
+    # чтобы имя и ключ совпали с теми, под которыми sorl хранит миниатюру.
+    backend = default.backend
+    source = _source(name)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return ImageFile(
+        backend._get_thumbnail_filename(source, geometry, options),
+        default.storage)
+
+
+def _lookup(files):
+    """Сериализованные записи KV-хранилища sorl по ключам миниатюр."""
+    keys = [add_prefix(file.key) for file in files]
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBKVStore):
+        return {key: kvstore._get_raw(key) for key in keys}
+    found = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        stored = dict(KVStore.objects.filter(key__in=missing)
+                      .values_list('key', 'value'))
+        kvstore.cache.set_many(stored, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        found.update(stored)
+    return found
+
+
+class Picture:
+    """Миниатюры одной картинки во всех ширинах и форматах."""
+
+    def __init__(self, files):
+        self.files = files
+
+    def srcset(self, image_format):
+        return ', '.join(
+            f'{self.files[width, image_format].url} {width}w'
+            for width in WIDTHS if (width, image_format) in self.files)
+
+    @property
+    def webp_srcset(self):
+        return self.srcset('WEBP')
+
+    @property
+    def jpeg_srcset(self):
+        return self.srcset('JPEG')
+
+    @property
+    def fallback(self):
+        return self.files.get((WIDTHS[-1], 'JPEG'))
+
+
+def attach(posts):
+    """Кладёт в post.thumbnail миниатюры картинки каждого поста: Picture,
+    None для картинки, которая не строится, или ничего, пока миниатюры
+    строятся."""
+    posts = [post for post in posts if post.image]
+    wanted = [
+        (post, variant, geometry, options,
+         _thumbnail_file(post.image.name, geometry, options))
+        for post in posts for variant, geometry, options in VARIANTS
+    ]
+    found = _lookup([file for *_, file in wanted])
+    pictures = {post.pk: {} for post in posts}
+    missing = set()
+    for post, variant, geometry, options, file in wanted:
+        value = found.get(add_prefix(file.key))
+        if value and value != EMPTY_VALUE:
+            pictures[post.pk][variant] = deserialize_image_file(value)
+        else:
+            missing.add(post.image.name)
+    failed = set()
+    if missing:
+        # Шаблон картинку не декодирует: карточка выходит без неё,
+        # а миниатюры строит фоновый поток.
+        keys = {_failed_key(name): name for name in missing}
+        failed = {keys[key] for key in cache.get_many(list(keys))}
+        for name in missing - failed:
+            _submit(name)
+    for post in posts:
+        if pictures[post.pk]:
+            post.thumbnail = Picture(pictures[post.pk])
+        elif post.image.name in failed:
+            # Картинка не строится: карточку без неё можно кэшировать.
+            post.thumbnail = None
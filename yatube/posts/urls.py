@@ -11,7 +11,14 @@ urlpatterns = [
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/', views.add_comment,
          name='add_comment'),
+    path('posts/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('tags/<str:name>/', views.tag_posts, name='tag_posts'),
+    path('autocomplete/<str:kind>/', views.suggestions,
+         name='autocomplete'),
+    path('export/', views.export_posts, name='export'),
+    path('search/', views.search_posts, name='search'),
     path('profile/<str:username>/follow/', views.profile_follow,
          name='profile_follow'),
     path('profile/<str:username>/unfollow/', views.profile_unfollow,
@@ -0,0 +1,70 @@
+"""Поколения данных, от которых зависят закэшированные фрагменты лент.
+
+Лента index зависит от всех постов, group_list и profile только от постов
+своей группы или автора, follow ещё и от подписок читателя. Имена авторов
+и группы видны во всех лентах. Из тех же номеров собираются ETag страниц
+(см. etags).
+"""
+from core import generations
+
+SHARED = ('users', 'groups')
+
+
+def index_version():
+    return generations.version('posts', *SHARED)
+
+
+def group_version(group_id):
+    return generations.version(f'group:{group_id}', *SHARED)
+
+
+def profile_version(author_id):
+    return generations.version(f'author:{author_id}', *SHARED)
+
+
+def follow_version(user_id):
+    return generations.version('posts', f'follow:{user_id}', *SHARED)
+
+
+def relations_version(author_id, reader_id=None):
+    """Подписчики автора и подписки читателя: счётчики и кнопка
+    подписки на профиле."""
+    scopes = [f'followers:{author_id}']
+    if reader_id is not None:
+        scopes.append(f'follow:{reader_id}')
+    return generations.version(*scopes)
+
+
+def comments_version(post_id):
+    """Порции комментариев поста (см. comments): сами комментарии
+    и имена их авторов."""
+    return generations.version(f'comments:{post_id}', 'users')
+
+
+def posts_changed(author_id, *group_ids):
+    scopes = ['posts', f'author:{author_id}']
+    scopes += [f'group:{group_id}' for group_id in set(group_ids)
+               if group_id is not None]
+    generations.bump(*scopes)
+
+
+def groups_changed():
+    generations.bump('groups')
+
+
+def users_changed():
+    generations.bump('users')
+
+
+def accounts_changed():
+    """Появился или удалён пользователь: меняется только список
+    в подсказках (см. autocomplete), ленты это не трогает."""
+    generations.bump('accounts')
+
+
+def comments_changed(post_id):
+    generations.bump(f'comments:{post_id}')
+
+
+def follows_changed(user_id, author_id):
+    generations.bump(f'follow:{user_id}', f'followers:{author_id}')
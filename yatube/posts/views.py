@@ -1,73 +1,132 @@
+from django.core.exceptions import PermissionDenied
 from django.core.paginator import Paginator
+from django.http import (
+    Http404, HttpResponse, JsonResponse, StreamingHttpResponse)
+from django.utils import timezone
+from django.utils.http import urlencode
 from django.shortcuts import render, get_object_or_404, redirect
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from .models import Post, Group, User, Follow
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_cookie
+from .models import Post, Group, User, Follow, Tag
 from .forms import PostForm, CommentForm
+from .paginators import CountedPaginator, CursorPaginator
+from . import (autocomplete, comments, counters, etags, export, feeds,
+               search, tags, thumbnails, versions)
 from django.contrib.auth import get_user_model
 
-from yatube.settings import PAGINATION_NUM
+from core.queries import query_budget
+from yatube.settings import FEED_MAX_PULLED_AUTHORS, PAGINATION_NUM
 
 User = get_user_model()
 
 
-def pagination(request, post_list, num_on_page):
-    paginator = Paginator(post_list, num_on_page)
+def pagination(request, post_list, num_on_page,
+               ordering=('-pub_date', '-pk'), count=None):
+    """Страница ленты по курсору ?cursor=; старые ссылки ?page=N
+    обслуживаются номерным пагинатором, который берёт общее число
+    у count (если оно передано) вместо COUNT(*)."""
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+    if page_number is not None:
+        post_list = post_list.order_by(*ordering)
+        if count is None:
+            paginator = Paginator(post_list, num_on_page)
+        else:
+            paginator = CountedPaginator(post_list, num_on_page, count)
+        return paginator.get_page(page_number)
+    paginator = CursorPaginator(post_list, num_on_page, ordering)
+    return paginator.get_cursor_page(request.GET.get('cursor'))
 
 
+@query_budget(4)
+@vary_on_cookie
+@condition(etag_func=etags.index_etag)
 def index(request):
     """View - функция для главной страницы проекта."""
-    post_list = Post.objects.all()
-    page_obj = pagination(request, post_list, PAGINATION_NUM)
+    post_list = Post.objects.select_related('author', 'group')
+    page_obj = pagination(request, post_list, PAGINATION_NUM,
+                          count=counters.post_count)
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'cache_version': versions.index_version(),
     }
     return render(request, 'posts/index.html', context)
 
 
+@query_budget(6)
+@vary_on_cookie
+@condition(etag_func=etags.group_etag)
 def group_posts(request, slug):
     """View - функция для страницы с постами, отфильтрованными по группам."""
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_obj = pagination(request, posts, PAGINATION_NUM)
+    posts = group.posts.select_related('author', 'group')
+    page_obj = pagination(
+        request, posts, PAGINATION_NUM,
+        count=lambda: counters.post_count(group_id=group.pk))
     context = {
         'group': group,
         'page_obj': page_obj,
+        'cache_version': versions.group_version(group.pk),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@query_budget(7)
+@vary_on_cookie
+@condition(etag_func=etags.profile_etag)
 def profile(request, username):
-    profile = get_object_or_404(User, username=username)
+    profile = get_object_or_404(User.objects.select_related('stats'),
+                                username=username)
     post_list = (
-        Post.objects.select_related("author")
-        .filter(author=profile).all()
+        Post.objects.select_related('author', 'group')
+        .filter(author=profile)
     )
-    page_obj = pagination(request, post_list, PAGINATION_NUM)
+    page_obj = pagination(
+        request, post_list, PAGINATION_NUM,
+        count=lambda: counters.post_count(author_id=profile.pk))
     following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user, author=profile).exists()
+    stats = counters.stats_for(profile)
     context = {
         'profile': profile,
         'page_obj': page_obj,
         'following': following,
+        'stats': stats,
+        'posts_count': stats.posts_count,
+        'cache_version': versions.profile_version(profile.pk),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@query_budget(6)
+@vary_on_cookie
+@condition(etag_func=etags.post_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id)
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    thumbnails.attach([post])
     context = {
         'post': post,
         'form': form,
-        'comments': comments,
+        # Без JavaScript «Показать ещё» ведёт сюда же с ?comments=.
+        'comments': comments.chunk(post.pk, request.GET.get('comments')),
+        'posts_count': counters.stats_for(post.author).posts_count,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+# Страница 404 ещё читает сессию и пользователя.
+@query_budget(4)
+def post_comments(request, post_id):
+    """Следующая порция комментариев поста: только её HTML."""
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    return HttpResponse(comments.chunk(post_id, request.GET.get('cursor')))
+
+
+# Плюс раскладка поста в ленты подписчиков (см. posts.feeds).
+@query_budget(15 + feeds.fan_out_queries())
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
@@ -75,6 +134,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule(post)
         return redirect('posts:profile', post.author)
     return render(request, 'posts/create_post.html', {'form': form})
 
@@ -85,16 +145,19 @@ def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     if post.author != request.user:
         return redirect('posts:post_detail', pk=post_id)
-    form = PostForm(request.POST or None, instance=post)
+    form = PostForm(request.POST or None, files=request.FILES or None,
+                    instance=post)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule(post)
         return redirect('posts:post_detail', post_id)
     return render(request, 'posts/create_post.html',
                   {"form": form, 'post': post, })
 
 
+@query_budget(6)
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
@@ -107,16 +170,95 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post.pk)
 
 
+# Плюс выборка на каждого pull-автора ленты (см. posts.feeds).
+@query_budget(4 + FEED_MAX_PULLED_AUTHORS)
 @login_required
+@vary_on_cookie
+@condition(etag_func=etags.follow_etag)
 def follow_index(request):
-    post_list = Post.objects.select_related('author').filter(
-        author__following__user=request.user)
-    page_obj = pagination(request,
-                          post_list, PAGINATION_NUM)
-    context = {'page_obj': page_obj, }
+    paginator = feeds.HybridFeedPaginator(request.user, PAGINATION_NUM)
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        page_obj = paginator.get_page(page_number)
+    else:
+        page_obj = paginator.get_cursor_page(request.GET.get('cursor'))
+    page_obj.object_list = [item.post for item in page_obj.object_list]
+    context = {
+        'page_obj': page_obj,
+        'cache_version': versions.follow_version(request.user.pk),
+    }
     return render(request, 'posts/follow.html', context)
 
 
+@query_budget(4)
+def tag_posts(request, name):
+    """Лента хештега: страница читается из индекса PostTag одним
+    диапазоном (tag, pub_date) вместе с постами."""
+    tag = get_object_or_404(Tag, name=tags.normalize(name))
+    items = tag.post_tags.select_related('post__author', 'post__group')
+    paginator = CursorPaginator(items, PAGINATION_NUM,
+                                ordering=('-pub_date', '-post_id'))
+    page_obj = paginator.get_cursor_page(request.GET.get('cursor'))
+    page_obj.object_list = [item.post for item in page_obj.object_list]
+    context = {
+        'tag': tag,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/tag_list.html', context)
+
+
+@query_budget(4)
+def search_posts(request):
+    """Поиск по тексту постов: FTS5 с ранжированием по bm25, на других
+    базах простой icontains."""
+    text = request.GET.get('q', '').strip()
+    if search.available():
+        paginator = search.SearchPaginator(search.match_query(text),
+                                           PAGINATION_NUM)
+        page_obj = paginator.get_cursor_page(request.GET.get('cursor'))
+    else:
+        posts = Post.objects.select_related('author', 'group').filter(
+            text__icontains=text)
+        page_obj = pagination(request, posts, PAGINATION_NUM)
+    context = {
+        'text': text,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': text}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@login_required
+def suggestions(request, kind):
+    """Подсказки для виджета Autocomplete в формате select2. Группы нужны
+    форме поста, авторы и посты - только админке."""
+    if kind not in autocomplete.KINDS:
+        raise Http404
+    if kind != 'groups' and not request.user.is_staff:
+        raise PermissionDenied
+    results = autocomplete.suggest(kind, request.GET.get('term', ''))
+    return JsonResponse({
+        'results': [{'id': pk, 'text': text} for pk, text in results],
+        'pagination': {'more': False},
+    })
+
+
+@staff_member_required
+def export_posts(request):
+    """Выгрузка постов, комментариев и подписок в NDJSON потоком:
+    ответ пишется по мере чтения таблиц, ?gzip=1 сжимает его на лету."""
+    compress = request.GET.get('gzip') == '1'
+    filename = f'yatube-{timezone.now():%Y%m%d-%H%M%S}.ndjson'
+    if compress:
+        filename += '.gz'
+    response = StreamingHttpResponse(
+        export.encoded(export.Export(), compress),
+        content_type=('application/gzip' if compress
+                      else 'application/x-ndjson; charset=utf-8'))
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
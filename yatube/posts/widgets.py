@@ -0,0 +1,22 @@
+from django import forms
+from django.contrib.admin.widgets import AutocompleteMixin
+from django.urls import reverse
+
+
+class Autocomplete(AutocompleteMixin, forms.Select):
+    """Выбор связанного объекта с подсказками select2 из админки.
+
+    В разметку попадает только выбранный вариант, остальные приходят
+    по мере ввода из posts:autocomplete (см. posts.autocomplete), так что
+    страница формы не растёт вместе с таблицей. Работает и в админке,
+    и в формах сайта.
+    """
+
+    def __init__(self, kind, attrs=None, choices=(), using=None):
+        self.kind = kind
+        self.db = using
+        self.choices = choices
+        self.attrs = {} if attrs is None else attrs.copy()
+
+    def get_url(self):
+        return reverse('posts:autocomplete', args=[self.kind])
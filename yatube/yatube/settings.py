@@ -30,6 +30,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.queries.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -108,10 +109,72 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки пишутся сразу во временный файл, а не копятся в памяти.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
     }
 }
 
+# Тесты берут тот же бэкенд с файлом во временном каталоге
+# (см. core.runner).
+TEST_RUNNER = 'core.runner.TestRunner'
+
 PAGINATION_NUM = 10
+
+# Бюджет SQL-запросов (см. core.queries): view без @query_budget
+# ограничены QUERY_BUDGET_DEFAULT (None - без ограничения), а запрос
+# одной формы можно повторить не больше QUERY_REPEAT_LIMIT раз.
+# Нарушения пишутся в лог, а при QUERY_BUDGET_RAISE роняют запрос.
+QUERY_BUDGET_DEFAULT = None
+QUERY_REPEAT_LIMIT = 5
+QUERY_BUDGET_RAISE = DEBUG
+
+FEED_FANOUT_BATCH_SIZE = 1000
+
+FEED_PULL_THRESHOLD = 10000
+
+FEED_MAX_PULLED_AUTHORS = 50
+
+FEED_PULLED_AUTHORS_TIMEOUT = 5 * 60
+
+# Старые ссылки ?page=N в ленте подписок: глубже этой страницы не идём,
+# дальше лента листается курсором.
+FEED_MAX_PAGE = 20
+
+POST_COUNT_RECONCILE_INTERVAL = 15 * 60
+
+POST_COUNT_ESTIMATE = False
+
+POST_CARD_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Комментарии на странице поста подгружаются порциями (см. posts.comments).
+COMMENTS_PER_PAGE = 20
+
+COMMENTS_CACHE_TIMEOUT = 24 * 60 * 60
+
+# Подсказки сбрасываются поколениями данных, TTL только чистит кэш.
+AUTOCOMPLETE_CACHE_TIMEOUT = 60 * 60
+
+# Миниатюры строятся в одном фоновом потоке (см. posts.thumbnails):
+# больше одного писателя SQLite не пускает. False - сразу в запросе.
+THUMBNAIL_BACKGROUND = True
+
+THUMBNAIL_QUEUE_SIZE = 100
+
+IMAGE_MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+
+IMAGE_MAX_PIXELS = 50_000_000
+# PNG, WebP и GIF Pillow не умеет декодировать в уменьшенном масштабе,
+# как JPEG (draft): кадр целиком в памяти, до 4 байт на пиксель.
+IMAGE_MAX_DECODED_PIXELS = 12_000_000
+
+IMAGE_MAX_SIDE = 2560